@@ -0,0 +1,382 @@
+"""
+Benchmarks de las operaciones del registro a escala sintética.
+
+Genera listas de estafadores con la forma de estafadores.json (nombre y uno o
+dos usuarios de CAM4 y de Telegram por persona) hasta la cantidad de alias
+pedida, y ejecuta los manejadores reales del bot (/s, /add, /list) y la carga y
+el guardado con objetos Update/Context falsos, sin red. Cada tamaño corre en un
+directorio temporal propio.
+
+Por operación informa latencia p50/p99, pico de memoria (tracemalloc, en una
+pasada aparte para no distorsionar los tiempos) y bytes escritos a disco.
+También verifica que /s devuelva lo mismo que puntuar todos los alias con
+RapidFuzz (equivalencia_busqueda). Los resultados se guardan en JSON; con
+--comparar se muestran las diferencias contra una ejecución anterior.
+
+Uso:
+    python benchmark.py --tamanos 1000 10000 --salida resultados.json
+    python benchmark.py --comparar resultados_anteriores.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+TAMANOS = (1_000, 10_000, 100_000, 1_000_000)
+
+NOMBRES = (
+    "Juan", "Marcela", "Agustina", "Jessica", "Lucía", "Sofía", "Valentina", "Camila", "Martina", "Micaela",
+    "Florencia", "Carla", "Daniela", "Romina", "Natalia", "Paula", "Abril", "Milagros", "Brenda", "Rocío",
+    "Diego", "Martín", "Lucas", "Matías", "Santiago", "Nicolás", "Pablo", "Federico", "Gonzalo", "Tomás",
+)
+APELLIDOS = (
+    "Pérez", "Ibáñez", "Domingo", "González", "Rodríguez", "Gómez", "Fernández", "López", "Díaz", "Martínez",
+    "Sánchez", "Romero", "Sosa", "Álvarez", "Torres", "Ruiz", "Ramírez", "Flores", "Benítez", "Acosta",
+    "Medina", "Herrera", "Aguirre", "Pereyra", "Gutiérrez", "Giménez", "Molina", "Silva", "Castro", "Rojas",
+)
+PALABRAS_USUARIO = (
+    "april", "perrita", "cachorra", "answer", "zeus", "heladera", "luna", "sol", "gatita", "dulce",
+    "angel", "diosa", "reina", "bella", "hot", "sexy", "baby", "candy", "cherry", "honey",
+    "lugoneta", "mimi", "nena", "princesa", "morena", "rubia", "tentacion", "fuego", "miel", "estrella",
+)
+
+
+def _con_errores(texto, probabilidad=0.15):
+    """Introduce un error de tipeo de vez en cuando, como en los datos reales ("Perrz", "Jeaica")."""
+    if len(texto) < 4 or random.random() > probabilidad:
+        return texto
+    i = random.randrange(1, len(texto) - 1)
+    return texto[:i] + random.choice(string.ascii_lowercase) + texto[i + 1:]
+
+
+def _usuario():
+    base = random.choice(PALABRAS_USUARIO)
+    if random.random() < 0.4:
+        base += random.choice(PALABRAS_USUARIO)
+    if random.random() < 0.2:
+        base = base.capitalize()
+    if random.random() < 0.7:
+        base += str(random.randint(0, 9999))
+    return _con_errores(base)
+
+
+def generar_estafadores(cantidad_alias, semilla=0):
+    """
+    Lista en formato estafadores.json con aproximadamente `cantidad_alias` cadenas
+    buscables (nombres más usuarios). Una persona de cada ocho tiene dos usuarios por plataforma.
+    """
+    random.seed(semilla)
+    estafadores = []
+    alias = 0
+    while alias < cantidad_alias:
+        nombre = f"{random.choice(NOMBRES)} {random.choice(APELLIDOS)}"
+        if random.random() < 0.5:
+            nombre += f" {random.choice(APELLIDOS)}"
+        nombre = _con_errores(nombre)
+        dobles = random.random() < 0.125
+        cam4_users = [_usuario() for _ in range(2 if dobles else 1)]
+        telegram_users = [_usuario() for _ in range(2 if dobles else 1)]
+        estafadores.append({"nombre": nombre, "cam4_users": cam4_users, "telegram_users": telegram_users})
+        alias += 1 + len(cam4_users) + len(telegram_users)
+    return estafadores
+
+
+# --- Objetos falsos de Telegram ---
+
+class MensajeFalso:
+    def __init__(self):
+        self.respuestas = 0
+        self.caracteres = 0
+
+    async def reply_text(self, texto, **kwargs):
+        self.respuestas += 1
+        self.caracteres += len(texto)
+
+
+class UsuarioFalso:
+    def __init__(self, id):
+        self.id = id
+        self.username = "benchmark"
+        self.full_name = "Benchmark"
+
+
+class UpdateFalso:
+    def __init__(self, id_usuario):
+        self.message = MensajeFalso()
+        self.effective_message = self.message
+        self.effective_user = UsuarioFalso(id_usuario)
+        self.callback_query = None
+        self.inline_query = None
+
+
+class ContextFalso:
+    def __init__(self, args):
+        self.args = args
+        self.user_data = {}
+        self.bot = None
+
+
+# --- Medición ---
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    i = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[i]
+
+
+def _resumen(tiempos, pico=None, bytes_escritos=None):
+    resultado = {
+        "n": len(tiempos),
+        "p50_ms": round(_percentil(tiempos, 50) * 1000, 4),
+        "p99_ms": round(_percentil(tiempos, 99) * 1000, 4),
+    }
+    if pico is not None:
+        resultado["pico_memoria_bytes"] = pico
+    if bytes_escritos is not None:
+        resultado["bytes_escritos"] = bytes_escritos
+    return resultado
+
+
+def _tamano(ruta):
+    return os.path.getsize(ruta) if os.path.exists(ruta) else 0
+
+
+def _bytes_en_disco(bot):
+    return _tamano(bot.ARCHIVO_ESTAFADORES) + _tamano(bot.ARCHIVO_DIARIO)
+
+
+async def _medir(operacion, repeticiones):
+    """Ejecuta `operacion()` (corrutina) `repeticiones` veces; devuelve los tiempos."""
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        await operacion(i)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+async def _pico_memoria(operacion, repeticiones=1):
+    tracemalloc.start()
+    try:
+        for i in range(repeticiones):
+            await operacion(i)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _consultas(estafadores, cantidad):
+    """Consultas de /s: alias con errores de tipeo, alias exactos y textos sin coincidencias."""
+    consultas = []
+    for _ in range(cantidad):
+        estafador = random.choice(estafadores)
+        tipo = random.random()
+        if tipo < 0.6:
+            texto = _con_errores(random.choice(estafador["cam4_users"] + estafador["telegram_users"]), 1.0)
+        elif tipo < 0.8:
+            texto = estafador["nombre"]
+        else:
+            texto = "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 12)))
+        consultas.append(texto.split())
+    return consultas
+
+
+def equivalencia_busqueda(bot, consultas, max_ejemplos=5):
+    """
+    Compara el resultado del índice de búsqueda con el de un único process.extract
+    sobre todos los alias (mismo límite, umbral y puntuación) y cuenta las consultas que difieren.
+    """
+    from busqueda import comparador, procesar, rapidfuzz
+
+    indice = bot.indice_busqueda
+    diferentes = []
+    for consulta in consultas:
+        texto = " ".join(consulta)
+        obtenidos = indice.buscar(
+            texto, limite=bot.LIMITE_RESULTADOS, umbral=bot.UMBRAL_SIMILITUD, scorer=bot.METODO_COMPARACION
+        )
+        esperados = rapidfuzz().process.extract(
+            procesar(texto),
+            indice.cadenas,
+            scorer=comparador(bot.METODO_COMPARACION),
+            processor=None,
+            limit=bot.LIMITE_RESULTADOS,
+            score_cutoff=bot.UMBRAL_SIMILITUD,
+        )
+        if [(cadena, puntaje) for cadena, puntaje, _ in obtenidos] != [(cadena, puntaje) for cadena, puntaje, _ in esperados]:
+            diferentes.append(texto)
+    return {"consultas": len(consultas), "diferentes": len(diferentes), "ejemplos": diferentes[:max_ejemplos]}
+
+
+async def medir_tamano(bot, cantidad_alias, repeticiones):
+    estafadores = generar_estafadores(cantidad_alias)
+    with open(bot.ARCHIVO_ESTAFADORES, "w", encoding="utf-8") as f:
+        json.dump(estafadores, f, ensure_ascii=False, indent=4)
+    if os.path.exists(bot.ARCHIVO_DIARIO):
+        os.remove(bot.ARCHIVO_DIARIO)
+
+    resultados = {"personas": len(estafadores)}
+    # La carga y el guardado de listas grandes tardan segundos: se repiten pocas veces.
+    repeticiones_lentas = max(1, min(5, repeticiones // 20))
+
+    # Carga desde el JSON (sin instantánea) y desde la instantánea que deja la primera carga.
+    async def cargar_json(_):
+        if os.path.exists(bot.ARCHIVO_INSTANTANEA):
+            os.remove(bot.ARCHIVO_INSTANTANEA)
+        bot.cargar_estafadores()
+    tiempos = await _medir(cargar_json, repeticiones_lentas)
+    resultados["cargar_estafadores_json"] = _resumen(tiempos, await _pico_memoria(cargar_json))
+
+    async def cargar(_):
+        bot.cargar_estafadores()
+    tiempos = await _medir(cargar, repeticiones_lentas)
+    resultados["cargar_estafadores"] = _resumen(tiempos, await _pico_memoria(cargar))
+    resultados["alias_indexados"] = len(bot.indice_busqueda)
+
+    consultas = _consultas(estafadores, repeticiones)
+
+    async def buscar(i):
+        await bot.buscar_estafador(UpdateFalso(bot.ID_ADMIN + 1), ContextFalso(consultas[i]))
+    tiempos = await _medir(buscar, repeticiones)
+    resultados["buscar_estafador"] = _resumen(tiempos, await _pico_memoria(buscar, min(20, repeticiones)))
+    # Cada comparación puntúa el corpus dos veces: alcanza con las primeras 100 consultas.
+    resultados["equivalencia_busqueda"] = equivalencia_busqueda(bot, consultas[:100])
+    if resultados["equivalencia_busqueda"]["diferentes"]:
+        print(f"  {resultados['equivalencia_busqueda']['diferentes']} búsquedas difieren de un escaneo completo.",
+              file=sys.stderr)
+
+    # /list: la primera llamada después de un cambio arma las páginas; las demás salen de la caché.
+    async def listar_en_frio(_):
+        bot.registro.generacion += 1
+        await bot.listar_estafadores(UpdateFalso(bot.ID_ADMIN + 1), ContextFalso([]))
+
+    async def listar(_):
+        await bot.listar_estafadores(UpdateFalso(bot.ID_ADMIN + 1), ContextFalso([]))
+    tiempos = await _medir(listar_en_frio, repeticiones_lentas)
+    resultados["listar_estafadores_sin_cache"] = _resumen(tiempos, await _pico_memoria(listar_en_frio))
+    resultados["listar_estafadores"] = _resumen(await _medir(listar, repeticiones))
+
+    # /add: mitad personas nuevas, mitad alias nuevos para personas existentes.
+    altas = []
+    for i in range(repeticiones):
+        if i % 2:
+            nombre = random.choice(estafadores)["nombre"]
+        else:
+            nombre = f"Benchmark {i} {random.choice(APELLIDOS)}"
+        altas.append(f"{nombre}; {_usuario()}b{i}; {_usuario()}b{i}".split())
+
+    async def agregar(i):
+        await bot.agregar_estafador(UpdateFalso(bot.ID_ADMIN), ContextFalso(altas[i]))
+    bytes_antes = _bytes_en_disco(bot)
+    tiempos = await _medir(agregar, repeticiones)
+    await bot.diario_estafadores.vaciar()
+    resultados["agregar_estafador"] = _resumen(tiempos, bytes_escritos=_bytes_en_disco(bot) - bytes_antes)
+
+    async def guardar(_):
+        bot.guardar_estafadores()
+    bytes_por_guardado = []
+    tiempos = []
+    for i in range(repeticiones_lentas):
+        inicio = time.perf_counter()
+        await guardar(i)
+        tiempos.append(time.perf_counter() - inicio)
+        bytes_por_guardado.append(_tamano(bot.ARCHIVO_ESTAFADORES))
+    resultados["guardar_estafadores"] = _resumen(
+        tiempos, await _pico_memoria(guardar), bytes_escritos=max(bytes_por_guardado)
+    )
+    return resultados
+
+
+def _version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, anterior):
+    """Imprime la variación de p50/p99 de cada operación respecto de una ejecución anterior."""
+    for tamano, operaciones in actual["resultados"].items():
+        previas = anterior.get("resultados", {}).get(tamano)
+        if not previas:
+            continue
+        print(f"\n{tamano} alias (vs {anterior.get('version')}):")
+        for operacion, datos in operaciones.items():
+            if not isinstance(datos, dict) or not isinstance(previas.get(operacion), dict):
+                continue
+            for clave in ("p50_ms", "p99_ms"):
+                antes = previas[operacion].get(clave)
+                if antes:
+                    cambio = (datos[clave] - antes) / antes * 100
+                    print(f"  {operacion:32} {clave}: {antes:10.3f} -> {datos[clave]:10.3f} ms ({cambio:+.1f}%)")
+
+
+async def ejecutar(tamanos, repeticiones):
+    # El bot lee y escribe sus archivos en el directorio actual: se importa
+    # dentro de un directorio temporal para no tocar la lista real.
+    import bot
+    logging.getLogger().setLevel(logging.WARNING)
+
+    resultados = {}
+    for cantidad in tamanos:
+        print(f"Midiendo {cantidad} alias...", file=sys.stderr)
+        resultados[str(cantidad)] = await medir_tamano(bot, cantidad, repeticiones)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS), help="Cantidades de alias a medir.")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Ejecuciones por operación rápida.")
+    parser.add_argument("--salida", default="benchmark_resultados.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para comparar.")
+    args = parser.parse_args()
+
+    salida = os.path.abspath(args.salida)
+    directorio_repo = os.path.dirname(os.path.abspath(__file__))
+    directorio = tempfile.mkdtemp(prefix="benchmark_estafadores_")
+    sys.path.insert(0, directorio_repo)
+    directorio_original = os.getcwd()
+    os.chdir(directorio)
+    try:
+        resultados = asyncio.run(ejecutar(args.tamanos, args.repeticiones))
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    informe = {
+        "version": _version(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticiones": args.repeticiones,
+        "resultados": resultados,
+    }
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=4)
+    print(json.dumps(resultados, ensure_ascii=False, indent=4))
+    print(f"Resultados guardados en {salida}", file=sys.stderr)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(informe, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Configuración de logging en segundo plano.
+
+Los manejadores de Telegram corren en el event loop: escribir cada línea en la
+consola desde ahí bloquea al resto de las actualizaciones. Con esta
+configuración el logger solo encola el registro, y un hilo aparte lo formatea y
+lo escribe. Para que el formateo también quede fuera del event loop, las
+llamadas usan formato perezoso: logger.info("texto %s", valor).
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+
+FORMATO = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    """
+    QueueHandler que encola el registro sin formatearlo: el mensaje se arma
+    recién en el hilo de escritura. Los argumentos deben ser valores que no
+    cambien después de la llamada (textos, números, tuplas).
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configurar_logging(nivel=logging.INFO, formato=FORMATO):
+    """Envía el logging raíz a una cola atendida por un hilo que escribe en la consola."""
+    cola = queue.SimpleQueue()
+    consola = logging.StreamHandler()
+    consola.setFormatter(logging.Formatter(formato))
+    oyente = logging.handlers.QueueListener(cola, consola, respect_handler_level=True)
+    logging.basicConfig(level=nivel, handlers=[ManejadorCola(cola)])
+    oyente.start()
+    # Al salir se escriben los registros que queden en la cola.
+    atexit.register(oyente.stop)
+    return oyente
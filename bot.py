@@ -1,9 +1,21 @@
 import asyncio
-from telegram.error import BadRequest
+from telegram.error import BadRequest, TelegramError
 import time
 import logging
 import json
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+import os
+import random
+import secrets
+import tempfile
+from itertools import zip_longest
+from telegram import (
+    Update,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InputMediaPhoto,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+)
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -12,9 +24,27 @@ from telegram.ext import (
     ContextTypes,
     ConversationHandler,
     CallbackQueryHandler,
+    InlineQueryHandler,
+    TypeHandler,
 )
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
+
+from bitacora import configurar_logging
+from concurrencia import ProcesadorPorUsuario
+from busqueda import BusquedaSaturada, CacheResultados, EjecutorBusquedas, IndiceBusqueda
+from evidencias import IndiceEvidencias, enlace_mensaje
+from importacion import FORMATOS, escribir_exportacion, leer_importacion
+from instantanea import InstantaneaInvalida, cargar_instantanea, escribir_instantanea, instantanea_vigente
+from persistencia import DiarioMutaciones, leer_diario
+from registro import RegistroMemoria
+from registro_sqlite import RegistroSQLite
+from reportes_pendientes import ReportesPendientes
+from limitador import PlanificadorEnvios
+from lista_paginada import ListadoPaginado
+from manejadores import tipos_de_actualizacion
+from metricas import LIMITES_COMPARACIONES, crear_metricas
+from normalizacion import limpiar_usuario
+from servidor_http import ServidorHTTP
+from webhook import servir_webhook
 
 # --- Configuración de Estados para la Conversación ---
 PEDIR_TEXTO_1 = 1
@@ -27,42 +57,446 @@ PEDIR_FOTO = 4 # Este estado ahora permite el envío de múltiples fotos
 # TOKEN_BOT = "TU_TOKEN_DE_BOT"
 # ID_ADMIN = TU_ID_DE_USUARIO_ADMIN # Debe ser un número entero
 # ID_CANAL_FOTOS = TU_ID_DE_CANAL_DE_FOTOS # Debe ser un número entero (ej. -1001234567890)
+# Opcionales:
+# BACKEND_REGISTRO = "json" # "json" (archivo + diario) o "sqlite"
+# ARCHIVO_SQLITE = "estafadores.db"
+# ARCHIVO_REPORTES_PENDIENTES = "reportes_pendientes.db"
+# TTL_REPORTES_PENDIENTES = 604800 # Segundos que un reporte espera revisión antes de descartarse
+# MAX_REPORTES_PENDIENTES = 10000
+# ARCHIVO_EVIDENCIAS = "evidencias.db" # Fotos ya publicadas en el canal (para no volver a subirlas)
+# MODO_ALBUM_EVIDENCIA = True # Envía las fotos adicionales como álbumes de hasta 10
+# TIMEOUT_REPORTE = 1800 # Segundos sin actividad tras los que se descarta un /r en curso
+# MAX_FOTOS_REPORTE = 20 # Fotos aceptadas por reporte
+# INTERVALO_BARRIDO_REPORTES = 300 # Cada cuántos segundos se liberan los reportes abandonados
+# TASA_GLOBAL = 30 # Envíos por segundo en total (límite de Telegram: ~30/s)
+# TASA_CHAT = 1 # Envíos por segundo a un mismo chat privado
+# RAFAGA_CHAT = 3
+# TASA_CANAL = 20 / 60 # Envíos por segundo a un mismo grupo o canal (límite de Telegram: ~20 por minuto)
+# RAFAGA_CANAL = 3 # Envíos seguidos permitidos antes de empezar a espaciar
+# MODO_ACTUALIZACIONES = "polling" # "polling" o "webhook"
+# URL_API_BOT = "http://localhost:8081/bot" # Servidor de la Bot API propio o de pruebas (por defecto, el de Telegram)
+# ACTUALIZACIONES_CONCURRENTES = 64 # Actualizaciones atendidas a la vez (de a una por usuario); 1 las atiende en serie
+# URL_WEBHOOK = "https://ejemplo.com/telegram" # URL pública que se registra en Telegram (None: no se registra)
+# WEBHOOK_HOST = "127.0.0.1" # Dirección y puerto donde escucha el servidor del webhook
+# WEBHOOK_PUERTO = 8443
+# WEBHOOK_RUTA = "/telegram"
+# SECRETO_WEBHOOK = "un-token-largo" # Si no se indica, se genera uno al azar en cada inicio
+# PUERTO_METRICAS = 9464 # Expone /metrics (formato Prometheus) en HOST_METRICAS; None lo desactiva
+# HOST_METRICAS = "127.0.0.1"
+# MAX_CACHE_BUSQUEDAS = 5000 # Consultas distintas cuyos resultados se guardan en memoria
+# MAX_FILAS_IMPORTACION = 50000 # Filas que se aceptan por archivo subido para importar
+# HILOS_BUSQUEDA = 4 # Hilos que ejecutan búsquedas aproximadas en paralelo (por defecto, hasta 4 según los núcleos)
+# MAX_BUSQUEDAS_EN_COLA = 64 # Búsquedas simultáneas admitidas; por encima se pide reintentar
+# TIMEOUT_BUSQUEDA = 10 # Segundos antes de cancelar una búsqueda
+# DIAGNOSTICO_BUSQUEDAS = False # Registra cada búsqueda (consulta, comparaciones, mejores puntajes, duración)
+# MUESTREO_BUSQUEDAS = 0.01 # Fracción de búsquedas que se registran cuando el diagnóstico está apagado
+import config
 from config import TOKEN_BOT, ID_ADMIN, ID_CANAL_FOTOS
 
+BACKEND_REGISTRO = getattr(config, "BACKEND_REGISTRO", "json")
+ARCHIVO_SQLITE = getattr(config, "ARCHIVO_SQLITE", "estafadores.db")
+ARCHIVO_REPORTES_PENDIENTES = getattr(config, "ARCHIVO_REPORTES_PENDIENTES", "reportes_pendientes.db")
+TTL_REPORTES_PENDIENTES = getattr(config, "TTL_REPORTES_PENDIENTES", 7 * 24 * 3600)
+MAX_REPORTES_PENDIENTES = getattr(config, "MAX_REPORTES_PENDIENTES", 10000)
+ARCHIVO_EVIDENCIAS = getattr(config, "ARCHIVO_EVIDENCIAS", "evidencias.db")
+MODO_ALBUM_EVIDENCIA = getattr(config, "MODO_ALBUM_EVIDENCIA", True)
+TIMEOUT_REPORTE = getattr(config, "TIMEOUT_REPORTE", 30 * 60)
+MAX_FOTOS_REPORTE = getattr(config, "MAX_FOTOS_REPORTE", 20)
+INTERVALO_BARRIDO_REPORTES = getattr(config, "INTERVALO_BARRIDO_REPORTES", 5 * 60)
+TASA_GLOBAL = getattr(config, "TASA_GLOBAL", 30)
+TASA_CHAT = getattr(config, "TASA_CHAT", 1)
+RAFAGA_CHAT = getattr(config, "RAFAGA_CHAT", 3)
+# Telegram admite unos 20 mensajes por minuto en un mismo grupo o canal; por encima responde RetryAfter.
+TASA_CANAL = getattr(config, "TASA_CANAL", 20 / 60)
+RAFAGA_CANAL = getattr(config, "RAFAGA_CANAL", 3)
+MODO_ACTUALIZACIONES = getattr(config, "MODO_ACTUALIZACIONES", "polling")
+URL_API_BOT = getattr(config, "URL_API_BOT", None)
+ACTUALIZACIONES_CONCURRENTES = getattr(config, "ACTUALIZACIONES_CONCURRENTES", 64)
+URL_WEBHOOK = getattr(config, "URL_WEBHOOK", None)
+WEBHOOK_HOST = getattr(config, "WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PUERTO = getattr(config, "WEBHOOK_PUERTO", 8443)
+WEBHOOK_RUTA = getattr(config, "WEBHOOK_RUTA", "/telegram")
+SECRETO_WEBHOOK = getattr(config, "SECRETO_WEBHOOK", None) or secrets.token_urlsafe(32)
+PUERTO_METRICAS = getattr(config, "PUERTO_METRICAS", None)
+HOST_METRICAS = getattr(config, "HOST_METRICAS", "127.0.0.1")
+MAX_FILAS_IMPORTACION = getattr(config, "MAX_FILAS_IMPORTACION", 50000)
+HILOS_BUSQUEDA = getattr(config, "HILOS_BUSQUEDA", None)
+MAX_BUSQUEDAS_EN_COLA = getattr(config, "MAX_BUSQUEDAS_EN_COLA", 64)
+TIMEOUT_BUSQUEDA = getattr(config, "TIMEOUT_BUSQUEDA", 10)
+DIAGNOSTICO_BUSQUEDAS = getattr(config, "DIAGNOSTICO_BUSQUEDAS", False)
+MUESTREO_BUSQUEDAS = getattr(config, "MUESTREO_BUSQUEDAS", 0.01)
+
 # --- Configuración de Logging ---
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
+# Los registros se escriben desde un hilo aparte (ver bitacora.py); usar formato perezoso con %s.
+configurar_logging(logging.INFO)
 logger = logging.getLogger(__name__)
+# Registros compactos de las búsquedas (ver registrar_busqueda).
+logger_busquedas = logging.getLogger(f"{__name__}.busquedas")
 
 # --- Variables Globales ---
 ARCHIVO_ESTAFADORES = "estafadores.json"
-estafadores = []
+# Diario de altas y fusiones que se aplican sobre el último snapshot de ARCHIVO_ESTAFADORES.
+ARCHIVO_DIARIO = "estafadores.journal.jsonl"
+# Cantidad de eventos en el diario a partir de la cual se escribe un nuevo snapshot.
+UMBRAL_COMPACTACION = 500
+# Copia binaria de ARCHIVO_ESTAFADORES con claves e índice de búsqueda ya calculados (ver instantanea.py).
+ARCHIVO_INSTANTANEA = "estafadores.snap"
+
+# Lista de estafadores: RegistroMemoria (estafadores.json + diario) o, con
+# BACKEND_REGISTRO = "sqlite", RegistroSQLite. Ambos exponen la misma interfaz.
+registro = RegistroMemoria()
+
+# Índice de búsqueda aproximada, construido en cargar_estafadores y actualizado
+# de forma incremental cada vez que se agrega un estafador o un alias. Guarda
+# referencias del registro (el objeto Estafador o, con SQLite, su id).
+indice_busqueda = IndiceBusqueda()
+
+# Parámetros de la búsqueda aproximada (/s y modo inline).
+METODO_COMPARACION = "token_sort_ratio" # Función de rapidfuzz.fuzz (se importa en la primera búsqueda)
+UMBRAL_SIMILITUD = 60
+LIMITE_RESULTADOS = 20
+
+# La puntuación aproximada (CPU) corre en un pool de hilos para no frenar el event loop.
+ejecutor_busquedas = EjecutorBusquedas(
+    hilos=HILOS_BUSQUEDA, max_en_cola=MAX_BUSQUEDAS_EN_COLA, timeout=TIMEOUT_BUSQUEDA
+)
+
+# Modo inline: espera antes de responder (para descartar teclas intermedias) y
+# segundos que Telegram puede reutilizar una respuesta sin volver a consultarnos.
+DEMORA_INLINE = 0.4
+CACHE_TIME_INLINE = 300
+# id de la última consulta inline de cada usuario, para responder solo a esa.
+ultima_consulta_inline = {}
+# Resultados de /s y del modo inline por consulta normalizada. Cada entrada queda
+# ligada a registro.generacion, que sube con cada alta o alias nuevo (/add o
+# aprobación de un reporte), así nunca se sirve un resultado viejo.
+# La clave es la consulta completa y no sus prefijos: al agregar una letra, un alias
+# que no llegaba al umbral puede pasarlo (y token_sort_ratio puede reordenar las
+# palabras), así que filtrar los resultados de "hela" para "helad" perdería
+# coincidencias. Las teclas intermedias del modo inline se descartan con DEMORA_INLINE.
+MAX_CACHE_BUSQUEDAS = getattr(config, "MAX_CACHE_BUSQUEDAS", 5000)
+cache_busquedas = CacheResultados(maximo=MAX_CACHE_BUSQUEDAS)
+
+# Páginas de /list, que se arman de nuevo solo cuando cambia la generación del registro.
+listado_paginado = ListadoPaginado()
+
+# Datos de los reportes pendientes de revisión, con interfaz de diccionario.
+# La clave es el message_id del mensaje enviado al canal. Se guardan en disco para
+# sobrevivir a reinicios y vencen a los TTL_REPORTES_PENDIENTES segundos.
+# Se abre en main() (None hasta entonces).
+pending_reports = None
+
+# Fotos de evidencia ya publicadas en el canal (file_unique_id -> primer mensaje).
+# Una foto repetida no se vuelve a subir: el caption del reporte enlaza el mensaje
+# original. Se abre en main() (None hasta entonces).
+indice_evidencias = None
+# Links a fotos repetidas que se incluyen como máximo en el caption (que admite 1024 caracteres).
+MAX_ENLACES_EVIDENCIA = 5
+
+# Moderación en lote (/pendientes, /aprobar, /rechazar): reportes que muestra
+# /pendientes, ediciones de caption en vuelo a la vez (el ritmo real lo pone el
+# planificador de envíos) y mensajes por llamada a deleteMessages (máximo de Telegram).
+MAX_REPORTES_LISTADO = 50
+MAX_EDICIONES_SIMULTANEAS = 8
+MAX_MENSAJES_BORRADO = 100
+# Largo máximo de un mensaje de texto de Telegram.
+MAX_LARGO_MENSAJE = 4096
+
+# Telegram acepta álbumes (send_media_group) de 2 a 10 elementos.
+MAX_FOTOS_ALBUM = 10
+
+# Prioridades de las llamadas salientes (a menor número, antes sale).
+PRIORIDAD_USUARIO = 0 # Respuestas a los usuarios y a los botones
+PRIORIDAD_CANAL = 1 # Mensajes de moderación en el canal (primera foto del reporte, ediciones)
+PRIORIDAD_EVIDENCIA = 2 # Fotos adicionales de los reportes
+
+def clasificar_envio(endpoint, data):
+    """Asigna la prioridad de una llamada saliente según su destino."""
+    if data.get("chat_id") != ID_CANAL_FOTOS:
+        return PRIORIDAD_USUARIO
+    if endpoint in ("sendPhoto", "sendMediaGroup"):
+        return PRIORIDAD_EVIDENCIA
+    return PRIORIDAD_CANAL
+
+# Latencias de manejadores y de llamadas a la API, errores y tamaños, en formato
+# Prometheus. Se registran siempre; el servidor HTTP solo se inicia si hay PUERTO_METRICAS.
+metricas = crear_metricas()
+servidor_metricas = None
+
+# Todas las llamadas a la API del bot pasan por este planificador (es el rate_limiter
+# de la Application): límites global y por chat, prioridades y reintentos ante RetryAfter.
+planificador_envios = PlanificadorEnvios(
+    tasa_global=TASA_GLOBAL,
+    tasa_chat=TASA_CHAT,
+    rafaga_chat=RAFAGA_CHAT,
+    tasa_grupo=TASA_CANAL,
+    rafaga_grupo=RAFAGA_CANAL,
+    clasificar=clasificar_envio,
+    metricas=metricas,
+)
+
+# Las actualizaciones de usuarios distintos se atienden en paralelo; las de un mismo
+# usuario, en orden (la conversación de /r depende de eso). Ver concurrencia.py.
+procesador_actualizaciones = ProcesadorPorUsuario(ACTUALIZACIONES_CONCURRENTES)
+
+def registrar_medidores():
+    """Valores que se leen recién cuando se piden las métricas."""
+    metricas.medidor("bot_registry_scammers", lambda: len(registro), "Estafadores en la lista.")
+    metricas.medidor("bot_search_index_aliases", lambda: len(indice_busqueda), "Alias en el índice de búsqueda.")
+    metricas.medidor(
+        "bot_pending_reports",
+        lambda: len(pending_reports) if pending_reports is not None else 0,
+        "Reportes esperando revisión.",
+    )
+    metricas.medidor(
+        "bot_api_queue_depth",
+        lambda: {
+            (("prioridad", prioridad),): datos["en_cola"]
+            for prioridad, datos in planificador_envios.metricas()["prioridades"].items()
+        },
+        "Llamadas a la API esperando en el limitador, por prioridad.",
+    )
+    metricas.medidor(
+        "bot_search_cache_requests_total",
+        lambda: {
+            (("resultado", "acierto"),): cache_busquedas.aciertos,
+            (("resultado", "fallo"),): cache_busquedas.fallos,
+        },
+        "Búsquedas servidas desde la caché de resultados y búsquedas calculadas.",
+        tipo="counter",
+    )
+    metricas.medidor(
+        "bot_updates_in_flight",
+        lambda: procesador_actualizaciones.current_concurrent_updates,
+        "Actualizaciones procesándose ahora (con lugar en el límite global).",
+    )
+    metricas.medidor(
+        "bot_update_users_active",
+        lambda: procesador_actualizaciones.usuarios_activos,
+        "Usuarios con actualizaciones en proceso o esperando su turno.",
+    )
+    metricas.medidor("bot_search_cache_entries", lambda: len(cache_busquedas), "Consultas en la caché de resultados.")
+    metricas.medidor("bot_search_in_flight", lambda: ejecutor_busquedas.en_curso, "Búsquedas en el pool de hilos.")
+    metricas.medidor(
+        "bot_search_dropped_total",
+        lambda: {
+            (("motivo", "saturado"),): ejecutor_busquedas.rechazadas,
+            (("motivo", "timeout"),): ejecutor_busquedas.vencidas,
+        },
+        "Búsquedas rechazadas por cola llena o canceladas por tiempo.",
+        tipo="counter",
+    )
 
-# Diccionario para almacenar temporalmente los datos de reportes pendientes.
-# La clave es el message_id del mensaje enviado al canal.
-pending_reports = {}
+registrar_medidores()
 
 # --- Funciones de Utilidad para Cargar/Guardar Estafadores ---
 def cargar_estafadores():
-    """Carga la lista de estafadores desde el archivo JSON."""
-    global estafadores
+    """Carga la lista de estafadores desde el almacenamiento configurado."""
+    if BACKEND_REGISTRO == "sqlite":
+        cargar_estafadores_sqlite()
+    else:
+        cargar_estafadores_json()
+
+def cargar_estafadores_json():
+    """
+    Carga la lista de estafadores desde el último snapshot JSON y aplica encima
+    los eventos del diario. Si el diario quedó largo, lo compacta.
+
+    Si la instantánea binaria corresponde al JSON actual se carga desde ella, sin
+    parsear el JSON ni reconstruir el índice; si no, se carga el JSON y se
+    escribe una instantánea nueva para el próximo arranque.
+    """
+    global registro
+    registro = RegistroMemoria()
+    if cargar_instantanea(ARCHIVO_INSTANTANEA, ARCHIVO_ESTAFADORES, registro, indice_busqueda):
+        logger.info("Lista cargada desde la instantánea %s.", ARCHIVO_INSTANTANEA)
+    else:
+        try:
+            with open(ARCHIVO_ESTAFADORES, "r", encoding="utf-8") as f:
+                lista = json.load(f)
+        except FileNotFoundError:
+            lista = None
+        except json.JSONDecodeError:
+            logger.warning("Error al decodificar JSON de %s. Inicializando lista vacía.", ARCHIVO_ESTAFADORES)
+            lista = None
+        registro.cargar(lista or [])
+        indice_busqueda.reconstruir(registro.iterar())
+        # Antes de aplicar el diario, mientras la lista coincide con el JSON. Con el
+        # backend SQLite el JSON solo se lee para migrarlo: no hace falta la instantánea.
+        if lista is not None and BACKEND_REGISTRO != "sqlite":
+            guardar_instantanea()
+
+    eventos = leer_diario(ARCHIVO_DIARIO)
+    for evento in eventos:
+        if evento.get("op") == "fusion":
+            fusionar_estafador(evento.get("nombre", ""), evento.get("cam4", ""), evento.get("telegram", ""))
+        else:
+            logger.warning("Evento desconocido en %s: %s", ARCHIVO_DIARIO, evento)
+    diario_estafadores.eventos_en_diario = len(eventos)
+    logger.info("Cargados %s estafadores (%s eventos del diario).", len(registro), len(eventos))
+
+    if len(eventos) > UMBRAL_COMPACTACION:
+        diario_estafadores.compactar()
+
+def cargar_estafadores_sqlite():
+    """
+    Abre la base SQLite y construye el índice de búsqueda recorriéndola. Si la base
+    está vacía, importa una única vez la lista actual de estafadores.json.
+    """
+    global registro
+    registro_sqlite = RegistroSQLite(ARCHIVO_SQLITE)
+    if not len(registro_sqlite) and os.path.exists(ARCHIVO_ESTAFADORES):
+        logger.info("Migrando %s a %s.", ARCHIVO_ESTAFADORES, ARCHIVO_SQLITE)
+        cargar_estafadores_json()
+        registro_sqlite.importar(registro.iterar())
+    registro = registro_sqlite
+    indice_busqueda.reconstruir(registro.iterar(), obtener_referencia=registro.referencia)
+    logger.info("Cargados %s estafadores desde %s.", len(registro), ARCHIVO_SQLITE)
+
+def guardar_instantanea():
+    """Escribe la instantánea binaria. Solo vale si la lista en memoria es igual a ARCHIVO_ESTAFADORES."""
     try:
-        with open(ARCHIVO_ESTAFADORES, "r", encoding="utf-8") as f:
-            estafadores = json.load(f)
-    except FileNotFoundError:
-        estafadores = []
-    except json.JSONDecodeError:
-        logger.warning(f"Error al decodificar JSON de {ARCHIVO_ESTAFADORES}. Inicializando lista vacía.")
-        estafadores = []
-    logger.info(f"Cargados {len(estafadores)} estafadores.")
+        escribir_instantanea(ARCHIVO_INSTANTANEA, ARCHIVO_ESTAFADORES, registro, indice_busqueda)
+    except (OSError, InstantaneaInvalida) as e:
+        logger.warning("No se pudo escribir la instantánea %s: %s", ARCHIVO_INSTANTANEA, e)
+
+def copiar_estafadores():
+    """
+    Copia la lista de estafadores para poder serializarla fuera del event loop
+    sin que los handlers la modifiquen mientras se escribe.
+    """
+    return registro.a_lista()
 
 def guardar_estafadores():
-    """Guarda la lista de estafadores en el archivo JSON."""
-    with open(ARCHIVO_ESTAFADORES, "w", encoding="utf-8") as f:
-        json.dump(estafadores, f, ensure_ascii=False, indent=4)
+    """Escribe un snapshot completo de la lista de estafadores y vacía el diario."""
+    diario_estafadores.compactar()
     logger.info("Estafadores guardados.")
 
+# Los handlers no reescriben el archivo: registran cada alta o fusión en el diario,
+# que se escribe en segundo plano y se compacta en un snapshot cuando crece demasiado.
+diario_estafadores = DiarioMutaciones(
+    ARCHIVO_ESTAFADORES, ARCHIVO_DIARIO, copiar_estafadores, umbral_compactacion=UMBRAL_COMPACTACION
+)
+
+async def iniciar_servicios(application: Application) -> None:
+    """Inicia el barrido de reportes abandonados y el servidor de métricas, si está configurado."""
+    global servidor_metricas
+    metricas.medidor(
+        "bot_report_conversations_active",
+        lambda: sum(1 for datos in application.user_data.values() if 'report_data' in datos),
+        "Reportes (/r) en curso.",
+    )
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(
+            barrer_reportes_abandonados, interval=INTERVALO_BARRIDO_REPORTES, name="barrer_reportes"
+        )
+    else:
+        logger.warning(
+            "Sin JobQueue (instalar python-telegram-bot[job-queue]): los reportes abandonados no vencen."
+        )
+    if PUERTO_METRICAS:
+        servidor_metricas = ServidorHTTP(metricas.manejar_http, HOST_METRICAS, PUERTO_METRICAS)
+        await servidor_metricas.iniciar()
+
+async def vaciar_guardado(application: Application) -> None:
+    """Escribe los cambios pendientes antes de que el bot se apague."""
+    if servidor_metricas is not None:
+        await servidor_metricas.detener()
+    ejecutor_busquedas.cerrar()
+    await diario_estafadores.vaciar()
+    # Si hubo una compactación, el JSON cambió: con el diario vacío la lista en memoria
+    # es igual al JSON y se puede dejar la instantánea lista para el próximo arranque.
+    if (
+        isinstance(registro, RegistroMemoria)
+        and not diario_estafadores.eventos_en_diario
+        and os.path.exists(ARCHIVO_ESTAFADORES)
+        and not instantanea_vigente(ARCHIVO_INSTANTANEA, ARCHIVO_ESTAFADORES)
+    ):
+        guardar_instantanea()
+    if isinstance(registro, RegistroSQLite):
+        registro.cerrar()
+    if pending_reports is not None:
+        pending_reports.cerrar()
+    if indice_evidencias is not None:
+        indice_evidencias.cerrar()
+
+def fusionar_estafador(nombre_completo_nuevo, user_cam4_nuevo, user_telegram_nuevo):
+    """
+    Agrega un estafador a la lista o, si ya existe uno con el mismo nombre
+    (sin distinguir mayúsculas), le suma los usuarios que todavía no tenga, y
+    mantiene al día el índice de búsqueda.
+
+    Devuelve (estafador, es_nuevo, added_info), donde added_info describe los
+    usuarios agregados a un estafador existente.
+    """
+    estafador, es_nuevo, agregados = registro.fusionar(nombre_completo_nuevo, user_cam4_nuevo, user_telegram_nuevo)
+    return estafador, es_nuevo, indexar_fusion(estafador, es_nuevo, agregados)
+
+def indexar_fusion(estafador, es_nuevo, agregados):
+    """Lleva al índice de búsqueda el resultado de una fusión. Devuelve added_info."""
+    referencia = registro.referencia(estafador)
+    if es_nuevo:
+        indice_busqueda.agregar_estafador(estafador, referencia)
+        return []
+
+    added_info = []
+    for campo, usuario in agregados:
+        indice_busqueda.agregar(usuario, referencia)
+        added_info.append(f"{'CAM4' if campo == 'cam4_users' else 'Telegram'}: {usuario}")
+    return added_info
+
+def registrar_estafador(nombre_completo_nuevo, user_cam4_nuevo, user_telegram_nuevo):
+    """
+    Aplica la fusión y, si cambió algo, la registra en el diario. Con SQLite la
+    fusión ya queda confirmada en la base y no hace falta el diario.
+    """
+    estafador, es_nuevo, added_info = fusionar_estafador(nombre_completo_nuevo, user_cam4_nuevo, user_telegram_nuevo)
+    if isinstance(registro, RegistroMemoria) and (es_nuevo or added_info):
+        diario_estafadores.registrar({
+            "op": "fusion",
+            "nombre": nombre_completo_nuevo,
+            "cam4": user_cam4_nuevo,
+            "telegram": user_telegram_nuevo,
+        })
+    return estafador, es_nuevo, added_info
+
+def importar_filas(filas):
+    """
+    Fusiona un lote de filas (nombre, usuarios_cam4, usuarios_telegram) con las
+    mismas reglas que /add. Con la lista en memoria los eventos quedan en el
+    diario para una sola escritura; con SQLite el lote es una sola transacción.
+    Devuelve (personas_nuevas, usuarios_nuevos), contando en usuarios_nuevos
+    solo los agregados a personas que ya estaban en la lista.
+    """
+    fusiones = [
+        (nombre, user_cam4 or "", user_telegram or "")
+        for nombre, cam4_users, telegram_users in filas
+        for user_cam4, user_telegram in zip_longest(cam4_users, telegram_users)
+    ]
+    resultados = registro.fusionar_lote(fusiones)
+
+    # Las personas nuevas se indexan una vez, al final, con todos sus usuarios
+    # (con SQLite el registro devuelto ya refleja el lote completo).
+    nuevos = {}
+    usuarios_nuevos = 0
+    for (nombre, user_cam4, user_telegram), (estafador, es_nuevo, agregados) in zip(fusiones, resultados):
+        referencia = registro.referencia(estafador)
+        if es_nuevo:
+            nuevos[referencia] = estafador
+        elif referencia not in nuevos:
+            indexar_fusion(estafador, False, agregados)
+            usuarios_nuevos += len(agregados)
+        if isinstance(registro, RegistroMemoria) and (es_nuevo or agregados):
+            diario_estafadores.registrar({
+                "op": "fusion",
+                "nombre": nombre,
+                "cam4": user_cam4,
+                "telegram": user_telegram,
+            })
+    for estafador in nuevos.values():
+        indexar_fusion(estafador, True, [])
+    return len(nuevos), usuarios_nuevos
+
 # --- Comandos del Bot ---
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Envía un mensaje de bienvenida."""
@@ -96,8 +530,8 @@ async def agregar_estafador(update: Update, context: ContextTypes.DEFAULT_TYPE)
             return
 
         nombre_completo_nuevo = parts[0].strip()
-        user_cam4_nuevo = parts[1].strip()
-        user_telegram_nuevo = parts[2].strip()
+        user_cam4_nuevo = limpiar_usuario(parts[1])
+        user_telegram_nuevo = limpiar_usuario(parts[2])
 
     except IndexError:
         await update.message.reply_text(
@@ -105,84 +539,104 @@ async def agregar_estafador(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return
 
-    estafador_existente = None
-    for estafador in estafadores:
-        if estafador.get("nombre", "").lower() == nombre_completo_nuevo.lower():
-            estafador_existente = estafador
-            break
-
-    if estafador_existente:
-        added_info = []
-        if "cam4_users" not in estafador_existente:
-            estafador_existente["cam4_users"] = []
-        if "telegram_users" not in estafador_existente:
-            estafador_existente["telegram_users"] = []
-
-        if user_cam4_nuevo and user_cam4_nuevo not in estafador_existente["cam4_users"]:
-            estafador_existente["cam4_users"].append(user_cam4_nuevo)
-            added_info.append(f"CAM4: {user_cam4_nuevo}")
-        if user_telegram_nuevo and user_telegram_nuevo not in estafador_existente["telegram_users"]:
-            estafador_existente["telegram_users"].append(user_telegram_nuevo)
-            added_info.append(f"Telegram: {user_telegram_nuevo}")
-
-        if added_info:
-            guardar_estafadores()
-            await update.message.reply_text(
-                f"Estafador '{nombre_completo_nuevo}' ya existía. Se añadió:\n- " + "\n- ".join(added_info)
-            )
-        else:
-            await update.message.reply_text(
-                f"El estafador '{nombre_completo_nuevo}' ya existe y los usuarios proporcionados ya estaban registrados."
-            )
-    else:
-        nuevo_estafador = {
-            "nombre": nombre_completo_nuevo,
-            "cam4_users": [user_cam4_nuevo] if user_cam4_nuevo else [],
-            "telegram_users": [user_telegram_nuevo] if user_telegram_nuevo else []
-        }
-        estafadores.append(nuevo_estafador)
-        guardar_estafadores()
+    _, es_nuevo, added_info = registrar_estafador(nombre_completo_nuevo, user_cam4_nuevo, user_telegram_nuevo)
+
+    if es_nuevo:
         await update.message.reply_text(
             f"Nuevo estafador '{nombre_completo_nuevo}' agregado a la lista con CAM4: {user_cam4_nuevo}, Telegram: {user_telegram_nuevo}."
         )
+    elif added_info:
+        await update.message.reply_text(
+            f"Estafador '{nombre_completo_nuevo}' ya existía. Se añadió:\n- " + "\n- ".join(added_info)
+        )
+    else:
+        await update.message.reply_text(
+            f"El estafador '{nombre_completo_nuevo}' ya existe y los usuarios proporcionados ya estaban registrados."
+        )
 
 async def listar_estafadores(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Lista todos los estafadores registrados, ordenados alfabéticamente."""
-    if not estafadores:
+    """Lista todos los estafadores registrados, ordenados alfabéticamente y por páginas."""
+    if not len(registro):
         await update.message.reply_text("La lista de estafadores está vacía.")
         return
 
-    nombres_unicos = sorted(list(set(e.get("nombre", "Nombre Desconocido") for e in estafadores if e.get("nombre"))))
-    cam4_unicos = sorted(list(set(user for e in estafadores for user in e.get("cam4_users", []))))
-    telegram_unicos = sorted(list(set(user for e in estafadores for user in e.get("telegram_users", []))))
+    response_text, reply_markup = pagina_lista(0)
+    await update.message.reply_text(response_text, parse_mode='Markdown', reply_markup=reply_markup)
 
-    response_text = "--- Lista de Estafadores ---\n\n"
+def pagina_lista(numero):
+    """Devuelve el texto y la botonera de una página de /list (contando desde 0)."""
+    paginas = listado_paginado.paginas(registro)
+    numero = max(0, min(numero, len(paginas) - 1))
 
-    if nombres_unicos:
-        response_text += "**Nombres Completos:**\n"
-        for i, nombre in enumerate(nombres_unicos, 1):
-            response_text += f"{i}. {nombre}\n"
-        response_text += "\n"
-    else:
-        response_text += "**Nombres Completos:** (Ninguno registrado)\n\n"
+    botones = []
+    if numero > 0:
+        botones.append(InlineKeyboardButton("◀️ Anterior", callback_data=f"lista_{numero - 1}"))
+    if numero < len(paginas) - 1:
+        botones.append(InlineKeyboardButton("Siguiente ▶️", callback_data=f"lista_{numero + 1}"))
+    reply_markup = InlineKeyboardMarkup([botones]) if botones else None
+    return paginas[numero], reply_markup
 
-    if cam4_unicos:
-        response_text += "**Usuarios CAM4:**\n"
-        for i, user in enumerate(cam4_unicos, 1):
-            response_text += f"{i}. {user}\n"
-        response_text += "\n"
-    else:
-        response_text += "**Usuarios CAM4:** (Ninguno registrado)\n\n"
+async def importar_estafadores(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Importa un archivo .csv o .jsonl enviado por el administrador: valida las
+    filas, las fusiona con la lista en un solo lote y guarda una vez.
+    """
+    if update.effective_user.id != ID_ADMIN:
+        await update.message.reply_text("¡No tienes permiso para usar este comando!")
+        return
 
-    if telegram_unicos:
-        response_text += "**Usuarios Telegram:**\n"
-        for i, user in enumerate(telegram_unicos, 1):
-            response_text += f"{i}. {user}\n"
-        response_text += "\n"
-    else:
-        response_text += "**Usuarios Telegram:** (Ninguno registrado)\n\n"
+    documento = update.message.document
+    formato = os.path.splitext(documento.file_name or "")[1].lower().lstrip(".")
+    if formato not in FORMATOS:
+        await update.message.reply_text("Formato no admitido. Envía un archivo .csv o .jsonl.")
+        return
 
-    await update.message.reply_text(response_text, parse_mode='Markdown')
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, f"importacion.{formato}")
+        archivo = await documento.get_file()
+        await archivo.download_to_drive(ruta)
+        filas, errores = await asyncio.to_thread(leer_importacion, ruta, formato, MAX_FILAS_IMPORTACION)
+
+    personas_nuevas, usuarios_nuevos = importar_filas(filas)
+    await diario_estafadores.vaciar()
+    logger.info(
+        "Importación de %s: %s filas, %s personas nuevas, %s usuarios nuevos, %s errores.",
+        documento.file_name, len(filas), personas_nuevas, usuarios_nuevos, len(errores),
+    )
+
+    respuesta = (
+        f"Importación terminada: {len(filas)} filas válidas, {personas_nuevas} estafadores nuevos "
+        f"y {usuarios_nuevos} usuarios agregados a estafadores existentes."
+    )
+    if errores:
+        respuesta += f"\n\n{len(errores)} filas descartadas:\n"
+        respuesta += "\n".join(f"Línea {numero}: {motivo}" for numero, motivo in errores[:20])
+        if len(errores) > 20:
+            respuesta += f"\n... y {len(errores) - 20} más."
+    await update.message.reply_text(respuesta)
+
+async def exportar_estafadores(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Envía la lista completa como archivo. Formato: /export [jsonl|csv]. Requiere permisos de administrador."""
+    if update.effective_user.id != ID_ADMIN:
+        await update.message.reply_text("¡No tienes permiso para usar este comando!")
+        return
+
+    formato = context.args[0].lower().lstrip(".") if context.args else "jsonl"
+    if formato not in FORMATOS:
+        await update.message.reply_text("Formato no admitido. Usa: /export jsonl o /export csv")
+        return
+
+    # La copia se toma en el event loop; la escritura del archivo va en un hilo aparte.
+    estafadores = copiar_estafadores()
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, f"estafadores.{formato}")
+        await asyncio.to_thread(escribir_exportacion, estafadores, ruta, formato)
+        with open(ruta, "rb") as archivo:
+            await update.message.reply_document(
+                archivo,
+                filename=f"estafadores.{formato}",
+                caption=f"{len(estafadores)} estafadores registrados.",
+            )
 
 async def buscar_estafador(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Busca un estafador por nombre, usuario de CAM4 o Telegram, con coincidencia aproximada, priorizando palabras."""
@@ -200,111 +654,198 @@ async def buscar_estafador(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         )
         return
 
-    scorer_method = fuzz.token_sort_ratio 
-    threshold = 60 
-    limit_results = 20
-
-    all_searchable_strings = []
-    estafador_by_string_index = [] 
-
-    for estafador_data in estafadores:
-        nombre = estafador_data.get("nombre", "")
-        cam4_users = estafador_data.get("cam4_users", [])
-        telegram_users = estafador_data.get("telegram_users", [])
-
-        if nombre:
-            all_searchable_strings.append(nombre.lower())
-            estafador_by_string_index.append(estafador_data)
-        for cam4_user in cam4_users:
-            all_searchable_strings.append(cam4_user.lower())
-            estafador_by_string_index.append(estafador_data)
-        for telegram_user in telegram_users:
-            all_searchable_strings.append(telegram_user.lower())
-            estafador_by_string_index.append(estafador_data)
-            
-    if not all_searchable_strings:
+    if not len(indice_busqueda):
         await update.message.reply_text("La lista de estafadores está vacía, no hay nada que buscar.")
         return
 
     try:
-        results = process.extract(query, all_searchable_strings, scorer=scorer_method, limit=limit_results)
-        
-        logger.info(f"Consulta de búsqueda: {query}")
-        logger.info(f"Umbral de similitud: {threshold}")
-        logger.info(f"Método de comparación: {scorer_method.__name__}")
-        logger.info(f"Cadenas disponibles para buscar: {all_searchable_strings}")
-        logger.info(f"Resultados brutos de process.extract: {results}")
-
+        es_exacta, coincidencias = await buscar_coincidencias(query)
+    except (BusquedaSaturada, asyncio.TimeoutError):
+        await update.message.reply_text(
+            "Hay muchas búsquedas en curso en este momento. Por favor, inténtalo de nuevo en unos segundos."
+        )
+        return
     except Exception as e:
-        logger.error(f"Error al llamar a process.extract: {e}")
+        logger.error("Error al buscar en el índice: %s", e)
         await update.message.reply_text(
             "Hubo un error interno al intentar buscar estafadores. Por favor, inténtalo de nuevo más tarde."
         )
         return
 
-    unique_matches = {} 
-
-    for item in results:
-        matched_string = None
-        score = None
-        index_in_choices_only = None
-
-        if len(item) == 3:
-            matched_string, score, index_in_choices_only = item
-        elif len(item) == 2:
-            matched_string, score = item
-            try:
-                index_in_choices_only = all_searchable_strings.index(matched_string)
-                logger.info(f"Índice encontrado manualmente para '{matched_string}': {index_in_choices_only}")
-            except ValueError:
-                logger.warning(f"No se pudo encontrar el índice para '{matched_string}'. Este resultado será omitido.")
-                continue
-        else:
-            logger.warning(f"Se encontró un resultado con un número inesperado de valores (ni 2 ni 3): {item}. Este item será omitido.")
-            continue
-
-        if matched_string and score is not None and index_in_choices_only is not None:
-            if score >= threshold:
-                original_estafador_data = estafador_by_string_index[index_in_choices_only]
-                
-                estafador_id = original_estafador_data.get("nombre", f"obj_{id(original_estafador_data)}")
-                
-                if estafador_id not in unique_matches:
-                    unique_matches[estafador_id] = original_estafador_data
-    
-    if unique_matches:
-        response_text = "Resultados de la búsqueda (coincidencia aproximada):\n\n"
-        for estafador_info in unique_matches.values():
-            nombre = estafador_info.get("nombre", "Nombre Desconocido")
-            cam4_users = ", ".join(estafador_info.get("cam4_users", [])) if estafador_info.get("cam4_users") else "N/A"
-            telegram_users = ", ".join(estafador_info.get("telegram_users", [])) if estafador_info.get("telegram_users") else "N/A"
-
-            response_text += f"**Nombre:** {nombre}\n"
-            response_text += f"  **CAM4:** {cam4_users}\n"
-            response_text += f"  **Telegram:** {telegram_users}\n\n"
+    if coincidencias:
+        tipo = "exacta" if es_exacta else "aproximada"
+        response_text = f"Resultados de la búsqueda (coincidencia {tipo}):\n\n"
+        response_text += formatear_estafadores(coincidencias)
     else:
-        response_text = f"No se encontraron estafadores que coincidan con '{query}' con un umbral de similitud de {threshold}% o más."
+        response_text = f"No se encontraron estafadores que coincidan con '{query}' con un umbral de similitud de {UMBRAL_SIMILITUD}% o más."
         response_text += "\n\nIntenta con una palabra clave diferente o un umbral más bajo si no obtienes resultados."
 
     await update.message.reply_text(response_text, parse_mode='Markdown')
 
+async def buscar_coincidencias(query):
+    """
+    Busca estafadores para `query` (ya en minúsculas). Devuelve (es_exacta, estafadores).
+    Los resultados se reutilizan mientras el registro no cambie (ver cache_busquedas);
+    "@usuario" y el link del perfil comparten entrada con "usuario".
+    """
+    inicio = time.perf_counter()
+    clave = limpiar_usuario(" ".join(query.split()))
+    estadisticas = {"origen": "cache"}
+    generacion = registro.generacion
+    resultado = cache_busquedas.obtener(clave, generacion)
+    if resultado is None:
+        resultado = await calcular_coincidencias(clave, estadisticas)
+        # Se guarda con la generación del comienzo: si el registro cambió mientras
+        # se buscaba, la entrada ya nace vencida.
+        cache_busquedas.guardar(clave, generacion, resultado)
+    registrar_busqueda(clave, estadisticas, len(resultado[1]), time.perf_counter() - inicio)
+    return resultado
+
+def registrar_busqueda(query, estadisticas, encontrados, duracion):
+    """
+    Deja un registro de una línea por búsqueda, con DIAGNOSTICO_BUSQUEDAS activado
+    o para una muestra de MUESTREO_BUSQUEDAS búsquedas.
+    """
+    if not DIAGNOSTICO_BUSQUEDAS and random.random() >= MUESTREO_BUSQUEDAS:
+        return
+    logger_busquedas.info(
+        "consulta=%r origen=%s comparaciones=%d encontrados=%d mejores=%s duracion_ms=%.2f",
+        query,
+        estadisticas["origen"],
+        estadisticas.get("comparaciones", 0),
+        encontrados,
+        estadisticas.get("mejores", ()),
+        duracion * 1000,
+    )
+
+async def calcular_coincidencias(query, estadisticas):
+    """
+    Busca estafadores para `query` en el registro y el índice. Devuelve (es_exacta, estafadores)
+    y anota en `estadisticas` el origen del resultado, los alias puntuados y los mejores puntajes.
+
+    Camino rápido: si el texto coincide exactamente con un nombre o un usuario, se
+    responde desde los índices del registro sin puntuar coincidencias aproximadas.
+    Si no, se toman hasta LIMITE_RESULTADOS alias con similitud >= UMBRAL_SIMILITUD,
+    sin repetir estafadores; esa parte corre en ejecutor_busquedas.
+    """
+    exact_matches = registro.buscar_exacto(query)
+    if exact_matches:
+        metricas.incrementar("bot_search_total", tipo="exacta")
+        estadisticas["origen"] = "exacta"
+        return True, exact_matches
+
+    results = await ejecutor_busquedas.ejecutar(
+        indice_busqueda.buscar,
+        query,
+        limite=LIMITE_RESULTADOS,
+        umbral=UMBRAL_SIMILITUD,
+        scorer=METODO_COMPARACION,
+        estadisticas=estadisticas,
+    )
+    metricas.incrementar("bot_search_total", tipo="aproximada")
+    metricas.observar("bot_search_comparisons", estadisticas["comparaciones"], limites=LIMITES_COMPARACIONES)
+    estadisticas["origen"] = "aproximada"
+    estadisticas["mejores"] = tuple((cadena, round(puntaje, 1)) for cadena, puntaje, _ in results[:3])
+
+    unique_matches = {} 
+
+    for matched_string, score, referencia in results:
+        original_estafador_data = registro.obtener(referencia)
+        estafador_id = original_estafador_data.nombre or f"obj_{id(original_estafador_data)}"
+
+        if estafador_id not in unique_matches:
+            unique_matches[estafador_id] = original_estafador_data
+
+    return False, list(unique_matches.values())
+
+async def buscar_estafador_inline(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Responde a `@bot texto` en cualquier chat con los estafadores que coinciden,
+    usando la misma búsqueda que /s. Requiere activar el modo inline en @BotFather.
+    """
+    inline_query = update.inline_query
+    query = inline_query.query.strip().lower()
+    if len(query) < 3 or not len(indice_busqueda):
+        return
+
+    # Telegram manda una consulta por cada tecla: se espera un momento y solo se
+    # responde si no llegó otra más nueva del mismo usuario.
+    user_id = inline_query.from_user.id
+    ultima_consulta_inline[user_id] = inline_query.id
+    await asyncio.sleep(DEMORA_INLINE)
+    if ultima_consulta_inline.get(user_id) != inline_query.id:
+        return
+    del ultima_consulta_inline[user_id]
+
+    try:
+        _, coincidencias = await buscar_coincidencias(query)
+    except (BusquedaSaturada, asyncio.TimeoutError):
+        return
+    resultados = [articulo_estafador(i, estafador) for i, estafador in enumerate(coincidencias)]
+    await inline_query.answer(resultados, cache_time=CACHE_TIME_INLINE)
+
+def articulo_estafador(numero, estafador):
+    """Arma el resultado inline de un estafador."""
+    cam4_users = ", ".join(estafador.cam4_users) if estafador.cam4_users else "N/A"
+    telegram_users = ", ".join(estafador.telegram_users) if estafador.telegram_users else "N/A"
+    return InlineQueryResultArticle(
+        id=str(numero),
+        title=estafador.nombre or "Nombre Desconocido",
+        description=f"CAM4: {cam4_users} | Telegram: {telegram_users}",
+        input_message_content=InputTextMessageContent(
+            "🚨 Reportado como estafador:\n\n" + formatear_estafadores([estafador]),
+            parse_mode='Markdown'
+        ),
+    )
+
+def formatear_estafadores(lista_estafadores):
+    """Arma el bloque de texto con nombre, usuarios de CAM4 y de Telegram de cada estafador."""
+    texto = ""
+    for estafador_info in lista_estafadores:
+        nombre = estafador_info.nombre or "Nombre Desconocido"
+        cam4_users = ", ".join(estafador_info.cam4_users) if estafador_info.cam4_users else "N/A"
+        telegram_users = ", ".join(estafador_info.telegram_users) if estafador_info.telegram_users else "N/A"
+
+        texto += f"**Nombre:** {nombre}\n"
+        texto += f"  **CAM4:** {cam4_users}\n"
+        texto += f"  **Telegram:** {telegram_users}\n\n"
+    return texto
+
 # --- Flujo de Conversación para Reportes ---
 async def iniciar_reporte(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Inicia la conversación para un nuevo reporte de estafador."""
     await update.message.reply_text(
         "¡Perfecto! Para tu reporte, necesito algunos detalles. Por favor, envía el **usuario de CAM4 o link del perfil**:"
     )
-    context.user_data['report_data'] = {'photos': []} # Inicializa una lista vacía para las fotos
+    # Lista vacía para las fotos; 'actualizado' permite descartar el reporte si se abandona.
+    context.user_data['report_data'] = {'photos': [], 'actualizado': time.time()}
     return PEDIR_TEXTO_1
 
+async def reporte_en_curso(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Datos del reporte en curso, con la hora de actividad al día. Si ya no están
+    (el reporte venció y se liberó), avisa al usuario y devuelve None.
+    """
+    report_data = context.user_data.get('report_data')
+    if report_data is None:
+        await update.message.reply_text(
+            "Tu reporte se descartó por inactividad. Puedes empezar uno nuevo con /r."
+        )
+        return None
+    report_data['actualizado'] = time.time()
+    return report_data
+
 async def user_cam4_reporte(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Guarda el usuario de CAM4 y pide el usuario de Telegram."""
     if not update.message.text:
         await update.message.reply_text("Por favor, envía un **texto** para el usuario de CAM4. Intenta de nuevo.")
         return PEDIR_TEXTO_1
 
-    texto_1 = update.message.text
-    context.user_data['report_data']['cam4_user'] = texto_1
+    report_data = await reporte_en_curso(update, context)
+    if report_data is None:
+        return ConversationHandler.END
+    texto_1 = limpiar_usuario(update.message.text)
+    report_data['cam4_user'] = texto_1
     await update.message.reply_text(
         "Gracias. Ahora, por favor, envía el **usuario de Telegram** (ej. @pepito):"
     )
@@ -316,8 +857,11 @@ async def user_telegram_reporte(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("Por favor, envía un **texto** para el usuario de Telegram. Intenta de nuevo.")
         return PEDIR_TEXTO_2
 
-    texto_2 = update.message.text
-    context.user_data['report_data']['telegram_user'] = texto_2
+    report_data = await reporte_en_curso(update, context)
+    if report_data is None:
+        return ConversationHandler.END
+    texto_2 = limpiar_usuario(update.message.text)
+    report_data['telegram_user'] = texto_2
     await update.message.reply_text(
         "Casi listo. Por favor, envía el **nombre completo de la modelo/estafadora** (ej. Juana Pérez):"
     )
@@ -329,8 +873,11 @@ async def nombre_completo_reporte(update: Update, context: ContextTypes.DEFAULT_
         await update.message.reply_text("Por favor, envía un **texto** para el nombre completo. Intenta de nuevo.")
         return PEDIR_TEXTO_3
 
+    report_data = await reporte_en_curso(update, context)
+    if report_data is None:
+        return ConversationHandler.END
     texto_3 = update.message.text
-    context.user_data['report_data']['nombre_estafador'] = texto_3
+    report_data['nombre_estafador'] = texto_3
     await update.message.reply_text(
         "¡Excelente! Ahora, por favor, envía las **FOTOS** como prueba de tu reporte (puedes enviar varias). Recordá que se tiene que ver la transferencia en el chat y ocultar tus datos para más privacidad.\n\n"
         "Cuando hayas terminado de enviar todas las fotos, usa el comando /finalizar_fotos"
@@ -338,13 +885,27 @@ async def nombre_completo_reporte(update: Update, context: ContextTypes.DEFAULT_
     return PEDIR_FOTO
 
 async def manejar_foto_reporte(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Maneja cada foto enviada, almacenando su file_id."""
+    """Maneja cada foto enviada, almacenando su file_id y su file_unique_id."""
     if not update.message.photo:
         await update.message.reply_text("Por favor, envía una **FOTO** válida. Intenta de nuevo.")
         return PEDIR_FOTO
 
-    photo_file_id = update.message.photo[-1].file_id # Obtiene la mejor calidad de la foto
-    context.user_data['report_data']['photos'].append(photo_file_id) # Agrega el ID de la foto a la lista
+    report_data = await reporte_en_curso(update, context)
+    if report_data is None:
+        return ConversationHandler.END
+    foto = update.message.photo[-1] # Obtiene la mejor calidad de la foto
+    fotos = report_data['photos']
+    if len(fotos) >= MAX_FOTOS_REPORTE:
+        await update.message.reply_text(
+            f"Ya enviaste el máximo de {MAX_FOTOS_REPORTE} fotos para este reporte. Usa el comando /finalizar_fotos para terminar."
+        )
+        return PEDIR_FOTO
+    if any(f["file_unique_id"] == foto.file_unique_id for f in fotos):
+        await update.message.reply_text(
+            "Esa foto ya la enviaste en este reporte. Puedes enviar otra o usar el comando /finalizar_fotos para terminar."
+        )
+        return PEDIR_FOTO
+    fotos.append({"file_id": foto.file_id, "file_unique_id": foto.file_unique_id}) # Agrega la foto a la lista
 
     await update.message.reply_text(
         "Foto recibida. Puedes enviar más fotos o usar el comando /finalizar_fotos para terminar el reporte."
@@ -355,17 +916,21 @@ async def finalizar_fotos(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     """
     Finaliza el proceso de envío de fotos. Envía la primera foto con descripción y botones.
     Las fotos subsiguientes se envían individualmente como respuestas a la primera.
+    Las fotos que ya se publicaron en el canal con otro reporte no se vuelven a
+    subir: el caption avisa que la evidencia está repetida y enlaza los mensajes originales.
     """
     user = update.effective_user
-    report_data = context.user_data.get('report_data', {})
+    report_data = await reporte_en_curso(update, context)
+    if report_data is None:
+        return ConversationHandler.END
 
     cam4_user_reporte = report_data.get('cam4_user', 'No proporcionado')
     telegram_user_reporte = report_data.get('telegram_user', 'No proporcionado')
     nombre_estafador_reporte = report_data.get('nombre_estafador', 'No proporcionado')
-    photos_file_ids = report_data.get('photos', [])
+    fotos = report_data.get('photos', [])
 
     # Verificar si se han enviado fotos
-    if not photos_file_ids:
+    if not fotos:
         await update.message.reply_text(
             "No has enviado ninguna foto. Por favor, envía al menos una antes de finalizar el reporte."
         )
@@ -381,6 +946,17 @@ async def finalizar_fotos(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     descripcion += f"Nombre Completo: {user.full_name}\n"
     descripcion += f"ID de Usuario: {user.id}"
 
+    # Separar las fotos ya publicadas en el canal. La primera foto lleva la descripción
+    # y los botones: si todas están repetidas, se vuelve a enviar una.
+    repetidas = indice_evidencias.buscar(f["file_unique_id"] for f in fotos)
+    nuevas = [f for f in fotos if f["file_unique_id"] not in repetidas]
+    foto_principal = nuevas[0] if nuevas else fotos[0]
+    fotos_adicionales = nuevas[1:]
+    if repetidas:
+        descripcion += aviso_evidencia_repetida(len(repetidas), repetidas.values())
+    metricas.incrementar("bot_evidence_photos_total", len(nuevas), resultado="nueva")
+    metricas.incrementar("bot_evidence_photos_total", len(repetidas), resultado="repetida")
+
     # Preparar los botones inline. El 'callback_data' del botón "Agregar a Estafadores"
     # se actualizará después de enviar la primera foto para incluir su Message ID.
     callback_data_delete = "delete_report_message" 
@@ -399,14 +975,16 @@ async def finalizar_fotos(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         # Al usar 'send_photo', los botones se adjuntan en la misma llamada.
         sent_message = await context.bot.send_photo(
             chat_id=ID_CANAL_FOTOS,
-            photo=photos_file_ids[0],
+            photo=foto_principal["file_id"],
             caption=descripcion,
             parse_mode='Markdown',
-            reply_markup=reply_markup_initial # Aquí se adjunta la botonera
+            reply_markup=reply_markup_initial, # Aquí se adjunta la botonera
+            rate_limit_args={"prioridad": PRIORIDAD_CANAL} # El usuario espera esta foto para la confirmación
         )
 
         # Usamos el message_id de la primera foto como el ID único para este reporte.
         report_id = str(sent_message.message_id) 
+        indice_evidencias.registrar([(foto_principal["file_unique_id"], sent_message.message_id)], report_id)
 
         # Actualizar el callback_data para el botón "Agregar a Estafadores"
         # con el 'report_id' real (el message_id de la primera foto).
@@ -422,44 +1000,43 @@ async def finalizar_fotos(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         # Esto también sirve como una "confirmación" de que la botonera está en su lugar.
         try:
             await sent_message.edit_reply_markup(reply_markup=updated_reply_markup)
-            logger.info(f"Botonera principal del reporte {report_id} confirmada/actualizada con ID real.")
+            logger.info("Botonera principal del reporte %s confirmada/actualizada con ID real.", report_id)
         except BadRequest as e:
             # Si el error es "Message is not modified", significa que los botones ya estaban correctamente.
             if "Message is not modified" in str(e):
-                logger.info(f"Botonera para reporte {report_id} ya estaba en su lugar. No se necesitó edición del callback_data.")
+                logger.info("Botonera para reporte %s ya estaba en su lugar. No se necesitó edición del callback_data.", report_id)
             else:
                 # Si es otro tipo de error de BadRequest, lo logueamos y lo propagamos.
-                logger.error(f"Error inesperado al intentar actualizar botonera principal de reporte {report_id}: {e}")
+                logger.error("Error inesperado al intentar actualizar botonera principal de reporte %s: %s", report_id, e)
                 raise e 
 
         # Almacenar los datos del reporte completo en `pending_reports` usando el report_id.
         pending_reports[report_id] = {
             "nombre": nombre_estafador_reporte,
             "cam4": cam4_user_reporte,
-            "telegram": telegram_user_reporte
+            "telegram": telegram_user_reporte,
+            "evidencia_repetida": len(repetidas),
+            "caption": descripcion, # Para editar el mensaje al moderar en lote (ver /aprobar)
         }
-        logger.info(f"Reporte con ID {report_id} almacenado temporalmente (primera foto con botones).")
-
-        # 2. Enviar las fotos subsiguientes (si las hay) como respuestas a la primera foto.
-        # Esto las "agrupa" visualmente en el chat.
-        if len(photos_file_ids) > 1:
-            for photo_id in photos_file_ids[1:]:
-                await context.bot.send_photo(
-                    chat_id=ID_CANAL_FOTOS,
-                    photo=photo_id,
-                    reply_to_message_id=sent_message.message_id # Hace que la foto responda a la primera
-                    # Estas fotos no llevan caption ni botones
-                )
-                await asyncio.sleep(0.1) # Pequeña pausa para evitar límites de tasa de Telegram
+        logger.info("Reporte con ID %s almacenado temporalmente (primera foto con botones).", report_id)
 
-        # Informar al usuario que el reporte ha sido enviado.
+        # Informar al usuario que el reporte ha sido enviado. El resto de las fotos
+        # se sube en segundo plano, así la confirmación no espera a todos los envíos.
         await update.message.reply_text(
             "¡Gracias! Tu reporte ha sido enviado al canal para revisión y se han añadido botones para gestionarlo."
         )
 
+        # 2. Enviar las fotos subsiguientes (si las hay) como respuestas a la primera foto.
+        # Esto las "agrupa" visualmente en el chat.
+        if fotos_adicionales:
+            context.application.create_task(
+                enviar_fotos_adicionales(context.bot, fotos_adicionales, sent_message.message_id),
+                update=update,
+            )
+
     except Exception as e:
         # Captura cualquier error general durante el proceso de envío de fotos.
-        logger.error(f"Error general al enviar las fotos del reporte: {e}")
+        logger.error("Error general al enviar las fotos del reporte: %s", e)
         await update.message.reply_text(
             "Hubo un error al enviar tu reporte. Por favor, inténtalo de nuevo más tarde."
         )
@@ -471,11 +1048,62 @@ async def finalizar_fotos(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     # Finalizar la conversación.
     return ConversationHandler.END
 
+def aviso_evidencia_repetida(cantidad, mensajes):
+    """Texto para el caption de un reporte con `cantidad` fotos ya publicadas en los `mensajes` del canal."""
+    mensajes = sorted(set(mensajes))
+    enlaces = []
+    for message_id in mensajes[:MAX_ENLACES_EVIDENCIA]:
+        enlace = enlace_mensaje(ID_CANAL_FOTOS, message_id)
+        enlaces.append(f"[#{message_id}]({enlace})" if enlace else f"#{message_id}")
+    if len(mensajes) > MAX_ENLACES_EVIDENCIA:
+        enlaces.append(f"y {len(mensajes) - MAX_ENLACES_EVIDENCIA} más")
+    return f"\n\n⚠️ **Evidencia repetida:** {cantidad} foto(s) ya publicadas en reportes anteriores: {', '.join(enlaces)}"
+
+async def enviar_fotos_adicionales(bot, fotos, reply_to_message_id):
+    """
+    Envía las fotos de un reporte posteriores a la primera como respuesta a ella.
+    Con MODO_ALBUM_EVIDENCIA se agrupan en álbumes de hasta MAX_FOTOS_ALBUM fotos
+    (una llamada por álbum); si no, se envían de a una. Las fotos no llevan caption ni botones.
+    El ritmo de envío lo marca el planificador de envíos, con prioridad de evidencia.
+    Cada foto enviada queda en indice_evidencias con su propio mensaje.
+    """
+    report_id = str(reply_to_message_id)
+    try:
+        if MODO_ALBUM_EVIDENCIA:
+            lotes = [fotos[i:i + MAX_FOTOS_ALBUM] for i in range(0, len(fotos), MAX_FOTOS_ALBUM)]
+        else:
+            lotes = [[foto] for foto in fotos]
+
+        for lote in lotes:
+            if len(lote) == 1:
+                enviados = [await bot.send_photo(
+                    chat_id=ID_CANAL_FOTOS,
+                    photo=lote[0]["file_id"],
+                    reply_to_message_id=reply_to_message_id # Hace que la foto responda a la primera
+                )]
+            else:
+                enviados = await bot.send_media_group(
+                    chat_id=ID_CANAL_FOTOS,
+                    media=[InputMediaPhoto(foto["file_id"]) for foto in lote],
+                    reply_to_message_id=reply_to_message_id
+                )
+            indice_evidencias.registrar(
+                [(foto["file_unique_id"], mensaje.message_id) for foto, mensaje in zip(lote, enviados)], report_id
+            )
+        logger.info("Enviadas %s fotos adicionales del reporte %s.", len(fotos), reply_to_message_id)
+    except Exception as e:
+        logger.error("Error al enviar las fotos adicionales del reporte %s: %s", reply_to_message_id, e)
+
 # --- Manejo de Callbacks de Botones Inline ---
 async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer() # Siempre responde a la callback query
 
+    # Los botones de página de /list los puede usar cualquiera.
+    if query.data.startswith("lista_"):
+        await cambiar_pagina_lista(query)
+        return
+
     user_id = query.from_user.id
     if user_id != ID_ADMIN:
         await query.edit_message_text("¡No tienes permiso para realizar esta acción!")
@@ -489,10 +1117,12 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
             await query.message.delete() 
             if message_id_str in pending_reports:
                 del pending_reports[message_id_str]
-                logger.info(f"Reporte con ID {message_id_str} eliminado de pending_reports.")
-            logger.info(f"Mensaje de reporte eliminado por el admin {user_id}.")
+                logger.info("Reporte con ID %s eliminado de pending_reports.", message_id_str)
+            # La foto del mensaje borrado ya no sirve como original de otras repetidas.
+            indice_evidencias.olvidar_mensaje(query.message.message_id)
+            logger.info("Mensaje de reporte eliminado por el admin %s.", user_id)
         except Exception as e:
-            logger.error(f"Error al intentar eliminar el mensaje: {e}")
+            logger.error("Error al intentar eliminar el mensaje: %s", e)
             await query.edit_message_text("No se pudo eliminar el mensaje.")
         return
 
@@ -502,11 +1132,11 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
         if report_id not in pending_reports:
             # Si los datos no se encuentran, puede que el bot se reiniciara o ya se procesó.
             await query.edit_message_caption(
-                caption=f"{query.message.caption}\n\n⚠️ **Error:** Datos del reporte no encontrados. El reporte puede haber sido procesado o el bot se reinició.",
+                caption=f"{query.message.caption}\n\n⚠️ **Error:** Datos del reporte no encontrados. El reporte puede haber sido procesado o haber vencido.",
                 parse_mode='Markdown',
                 reply_markup=None
             )
-            logger.warning(f"Intento de añadir estafador con ID {report_id} pero no se encontró en pending_reports.")
+            logger.warning("Intento de añadir estafador con ID %s pero no se encontró en pending_reports.", report_id)
             return
 
         report_data = pending_reports[report_id]
@@ -514,46 +1144,19 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
         user_cam4_nuevo = report_data.get("cam4", "")
         user_telegram_nuevo = report_data.get("telegram", "")
 
-        estafador_existente = None
-        for estafador in estafadores:
-            if estafador.get("nombre", "").lower() == nombre_completo_nuevo.lower():
-                estafador_existente = estafador
-                break
-
-        response_text = ""
-        if estafador_existente:
-            added_info = []
-            if "cam4_users" not in estafador_existente:
-                estafador_existente["cam4_users"] = []
-            if "telegram_users" not in estafador_existente:
-                estafador_existente["telegram_users"] = []
-
-            if user_cam4_nuevo and user_cam4_nuevo not in estafador_existente["cam4_users"]:
-                estafador_existente["cam4_users"].append(user_cam4_nuevo)
-                added_info.append(f"CAM4: {user_cam4_nuevo}")
-            if user_telegram_nuevo and user_telegram_nuevo not in estafador_existente["telegram_users"]:
-                estafador_existente["telegram_users"].append(user_telegram_nuevo)
-                added_info.append(f"Telegram: {user_telegram_nuevo}")
-
-            if added_info:
-                guardar_estafadores()
-                response_text = f"Estafador **'{nombre_completo_nuevo}'** ya existía. Se añadió:\n- " + "\n- ".join(added_info)
-            else:
-                response_text = f"El estafador **'{nombre_completo_nuevo}'** ya existe y los usuarios proporcionados ya estaban registrados."
-        else:
-            nuevo_estafador = {
-                "nombre": nombre_completo_nuevo,
-                "cam4_users": [user_cam4_nuevo] if user_cam4_nuevo else [],
-                "telegram_users": [user_telegram_nuevo] if user_telegram_nuevo else []
-            }
-            estafadores.append(nuevo_estafador)
-            guardar_estafadores()
+        _, es_nuevo, added_info = registrar_estafador(nombre_completo_nuevo, user_cam4_nuevo, user_telegram_nuevo)
+
+        if es_nuevo:
             response_text = f"Nuevo estafador **'{nombre_completo_nuevo}'** agregado a la lista con CAM4: {user_cam4_nuevo}, Telegram: {user_telegram_nuevo}."
+        elif added_info:
+            response_text = f"Estafador **'{nombre_completo_nuevo}'** ya existía. Se añadió:\n- " + "\n- ".join(added_info)
+        else:
+            response_text = f"El estafador **'{nombre_completo_nuevo}'** ya existe y los usuarios proporcionados ya estaban registrados."
         
         # Eliminar el reporte de la lista temporal después de procesarlo
         if report_id in pending_reports:
             del pending_reports[report_id]
-            logger.info(f"Reporte con ID {report_id} procesado y eliminado de pending_reports.")
+            logger.info("Reporte con ID %s procesado y eliminado de pending_reports.", report_id)
 
         # Edita el mensaje original para indicar que se añadió a la lista
         original_caption = query.message.caption if query.message.caption else ""
@@ -566,12 +1169,226 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
             parse_mode='Markdown',
             reply_markup=None # Quitar la botonera después de la acción para evitar reprocesar
         )
-        logger.info(f"Reporte de estafador procesado: {nombre_completo_nuevo}.")
+        logger.info("Reporte de estafador procesado: %s.", nombre_completo_nuevo)
 
     else:
-        logger.warning(f"Callback data desconocida: {callback_data}")
+        logger.warning("Callback data desconocida: %s", callback_data)
         await query.edit_message_text("Acción de botón desconocida.")
+
+# --- Moderación en Lote de Reportes Pendientes ---
+def partir_mensaje(lineas, maximo=MAX_LARGO_MENSAJE):
+    """Agrupa líneas en textos de hasta `maximo` caracteres (una línea más larga se corta)."""
+    textos = []
+    actual = ""
+    for linea in lineas:
+        linea = linea[:maximo]
+        if actual and len(actual) + 1 + len(linea) > maximo:
+            textos.append(actual)
+            actual = ""
+        actual = f"{actual}\n{linea}" if actual else linea
+    if actual:
+        textos.append(actual)
+    return textos
+
+async def listar_pendientes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Lista los reportes pendientes de revisión, del más viejo al más nuevo. Requiere permisos de administrador."""
+    if update.effective_user.id != ID_ADMIN:
+        await update.message.reply_text("¡No tienes permiso para usar este comando!")
+        return
+
+    total = len(pending_reports)
+    if not total:
+        await update.message.reply_text("No hay reportes pendientes.")
+        return
+
+    lineas = [
+        f"Reportes pendientes: {total}. Usa /aprobar o /rechazar con los IDs separados por espacios, o 'todos'.",
+        "",
+    ]
+    for report_id, datos in pending_reports.items(limite=MAX_REPORTES_LISTADO):
+        linea = f"{report_id}: {datos.get('nombre', '')} | CAM4: {datos.get('cam4', '')} | Telegram: {datos.get('telegram', '')}"
+        if datos.get("evidencia_repetida"):
+            linea += f" | ⚠️ {datos['evidencia_repetida']} foto(s) repetida(s)"
+        lineas.append(linea)
+    if total > MAX_REPORTES_LISTADO:
+        lineas.append(f"... y {total - MAX_REPORTES_LISTADO} más.")
+    # Sin parse_mode: los nombres y usuarios reportados pueden traer caracteres de Markdown.
+    for texto in partir_mensaje(lineas):
+        await update.message.reply_text(texto)
+
+def seleccionar_reportes(args):
+    """IDs de reporte pedidos en /aprobar o /rechazar (sin repetir), o todos los pendientes con "todos"."""
+    if len(args) == 1 and args[0].lower() == "todos":
+        return [report_id for report_id, _ in pending_reports.items()]
+    ids = (argumento.strip(",") for argumento in args)
+    return list(dict.fromkeys(report_id for report_id in ids if report_id.isdigit()))
+
+async def aprobar_reportes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Aprueba varios reportes pendientes: /aprobar [ID ...] o /aprobar todos. Requiere
+    permisos de administrador. Las fusiones se aplican en memoria y se guardan con
+    una sola escritura; los mensajes del canal se actualizan en segundo plano.
+    """
+    if update.effective_user.id != ID_ADMIN:
+        await update.message.reply_text("¡No tienes permiso para usar este comando!")
+        return
+
+    report_ids = seleccionar_reportes(context.args)
+    if not report_ids:
+        await update.message.reply_text("Formato incorrecto. Usa: /aprobar [ID ...] o /aprobar todos (ver /pendientes)")
+        return
+
+    reportes = pending_reports.obtener_varios(report_ids)
+    faltantes = [report_id for report_id in report_ids if report_id not in reportes]
+    # Misma regla que el botón "Agregar a Estafadores": una fusión por reporte.
+    filas = [
+        (datos.get("nombre", ""), [datos.get("cam4", "")], [datos.get("telegram", "")])
+        for datos in reportes.values()
+    ]
+    # Fusión y baja de los pendientes sin esperas en el medio: ningún otro manejador
+    # ve el lote a medias ni puede aprobar de nuevo los mismos reportes.
+    personas_nuevas, usuarios_nuevos = importar_filas(filas)
+    pending_reports.eliminar_varios(list(reportes))
+    await diario_estafadores.vaciar()
+    logger.info("Aprobados en lote %s reportes: %s personas nuevas, %s usuarios nuevos.",
+                len(reportes), personas_nuevas, usuarios_nuevos)
+
+    respuesta = (
+        f"Reportes aprobados: {len(reportes)}.\n"
+        f"Personas nuevas: {personas_nuevas}. Usuarios agregados a personas existentes: {usuarios_nuevos}."
+    )
+    if faltantes:
+        respuesta += f"\nNo encontrados (ya procesados o vencidos): {', '.join(faltantes)}"
+    await update.message.reply_text(respuesta)
+
+    if reportes:
+        context.application.create_task(
+            editar_reportes_moderados(context.bot, reportes, "✔️ Aprobado en lote."), update=update
+        )
+
+async def rechazar_reportes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Descarta varios reportes pendientes y borra sus mensajes del canal:
+    /rechazar [ID ...] o /rechazar todos. Requiere permisos de administrador.
+    """
+    if update.effective_user.id != ID_ADMIN:
+        await update.message.reply_text("¡No tienes permiso para usar este comando!")
+        return
+
+    report_ids = seleccionar_reportes(context.args)
+    if not report_ids:
+        await update.message.reply_text("Formato incorrecto. Usa: /rechazar [ID ...] o /rechazar todos (ver /pendientes)")
+        return
+
+    reportes = pending_reports.obtener_varios(report_ids)
+    faltantes = [report_id for report_id in report_ids if report_id not in reportes]
+    pending_reports.eliminar_varios(list(reportes))
+    # Las fotos de los mensajes borrados ya no sirven como original de otras repetidas.
+    indice_evidencias.olvidar_mensajes([int(report_id) for report_id in reportes])
+    logger.info("Rechazados en lote %s reportes.", len(reportes))
+
+    respuesta = f"Reportes rechazados: {len(reportes)}."
+    if faltantes:
+        respuesta += f"\nNo encontrados (ya procesados o vencidos): {', '.join(faltantes)}"
+    await update.message.reply_text(respuesta)
+
+    if reportes:
+        context.application.create_task(borrar_reportes(context.bot, list(reportes)), update=update)
+
+async def editar_reportes_moderados(bot, reportes, estado):
+    """
+    Agrega `estado` al caption del mensaje de cada reporte y quita sus botones.
+    Las ediciones salen en paralelo (hasta MAX_EDICIONES_SIMULTANEAS en vuelo) y
+    el planificador de envíos las espacia según el límite del canal. Los reportes
+    guardados antes de que se conservara el caption solo pierden los botones.
+    Devuelve cuántas ediciones fallaron.
+    """
+    semaforo = asyncio.Semaphore(MAX_EDICIONES_SIMULTANEAS)
+    sufijo = f"\n\n{estado} (Actualizado: {int(time.time())})"
+
+    async def editar(report_id, datos):
+        async with semaforo:
+            try:
+                if datos.get("caption"):
+                    await bot.edit_message_caption(
+                        chat_id=ID_CANAL_FOTOS,
+                        message_id=int(report_id),
+                        caption=datos["caption"] + sufijo,
+                        parse_mode='Markdown',
+                        reply_markup=None, # Sin botonera, como al aprobar con el botón
+                    )
+                else:
+                    await bot.edit_message_reply_markup(chat_id=ID_CANAL_FOTOS, message_id=int(report_id), reply_markup=None)
+                return True
+            except TelegramError as e:
+                logger.warning("No se pudo actualizar el mensaje del reporte %s: %s", report_id, e)
+                return False
+
+    resultados = await asyncio.gather(*(editar(report_id, datos) for report_id, datos in reportes.items()))
+    fallidas = resultados.count(False)
+    logger.info("Mensajes de reportes moderados actualizados: %s de %s.", len(resultados) - fallidas, len(resultados))
+    return fallidas
+
+async def borrar_reportes(bot, report_ids):
+    """Borra del canal los mensajes de varios reportes, de a MAX_MENSAJES_BORRADO por llamada."""
+    message_ids = [int(report_id) for report_id in report_ids]
+    for inicio in range(0, len(message_ids), MAX_MENSAJES_BORRADO):
+        lote = message_ids[inicio:inicio + MAX_MENSAJES_BORRADO]
+        try:
+            await bot.delete_messages(chat_id=ID_CANAL_FOTOS, message_ids=lote)
+        except TelegramError as e:
+            logger.warning("No se pudieron borrar %s mensajes de reportes: %s", len(lote), e)
+    logger.info("Borrados %s mensajes de reportes rechazados.", len(message_ids))
+
+async def cambiar_pagina_lista(query) -> None:
+    """Muestra otra página de /list en el mismo mensaje."""
+    try:
+        numero = int(query.data.replace("lista_", ""))
+    except ValueError:
+        logger.warning("Página de lista inválida: %s", query.data)
+        return
+
+    response_text, reply_markup = pagina_lista(numero)
+    try:
+        await query.edit_message_text(response_text, parse_mode='Markdown', reply_markup=reply_markup)
+    except BadRequest as e:
+        # Dos toques seguidos en el mismo botón dejan el mensaje igual: no es un error.
+        if "Message is not modified" not in str(e):
+            raise
+
 # --- Manejo de Errores y Cancelación ---
+async def reporte_vencido(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """La conversación de /r pasó TIMEOUT_REPORTE segundos sin actividad: se liberan sus datos."""
+    if context.user_data.pop('report_data', None) is not None:
+        metricas.incrementar("bot_report_conversations_expired_total", motivo="timeout")
+    if update.effective_chat is not None:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="Tu reporte se descartó por inactividad. Puedes empezar uno nuevo con /r.",
+        )
+
+async def barrer_reportes_abandonados(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Tarea periódica: libera los datos de los reportes sin actividad hace más de
+    TIMEOUT_REPORTE segundos que no liberó el timeout de la conversación (por
+    ejemplo, si el aviso no pudo enviarse) y descarta los user_data que quedan vacíos.
+    """
+    limite = time.time() - TIMEOUT_REPORTE
+    application = context.application
+    abandonados = [
+        user_id
+        for user_id, datos in application.user_data.items()
+        if datos.get('report_data', {}).get('actualizado', limite) < limite
+    ]
+    for user_id in abandonados:
+        del application.user_data[user_id]['report_data']
+    vacios = [user_id for user_id, datos in application.user_data.items() if not datos]
+    for user_id in vacios:
+        application.drop_user_data(user_id)
+    if abandonados:
+        metricas.incrementar("bot_report_conversations_expired_total", len(abandonados), motivo="barrido")
+        logger.info("Barrido: %s reportes abandonados liberados.", len(abandonados))
+
 async def cancelar_reporte(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancela la conversación de reporte."""
     if 'report_data' in context.user_data:
@@ -583,24 +1400,35 @@ async def cancelar_reporte(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
 async def manejar_error(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Maneja los errores del bot."""
-    logger.warning(f"La actualización {update} causó el error {context.error}")
+    logger.warning("La actualización %s causó el error %s", update, context.error)
     if update.message:
         await update.message.reply_text(
             "¡Ups! Ha ocurrido un error. Por favor, inténtalo de nuevo más tarde."
         )
 
 # --- Función Principal del Bot ---
-def main() -> None:
-    """Configura y ejecuta el bot."""
-    cargar_estafadores() # Carga la lista de estafadores al iniciar el bot
-
-    application = Application.builder().token(TOKEN_BOT).build()
+def crear_aplicacion() -> Application:
+    """Arma la Application con todos los manejadores, sin iniciarla."""
+    constructor = (
+        Application.builder()
+        .token(TOKEN_BOT)
+        .rate_limiter(planificador_envios) # Toda llamada saliente pasa por el planificador
+        .concurrent_updates(procesador_actualizaciones)
+        .post_init(iniciar_servicios)
+        .post_shutdown(vaciar_guardado) # Garantiza que los cambios pendientes se escriban al apagar
+    )
+    if URL_API_BOT:
+        # Las llamadas van a "{URL_API_BOT}{token}/{método}" (ver prueba_carga.py)
+        constructor = constructor.base_url(URL_API_BOT)
+    application = constructor.build()
 
     # Comandos generales
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("add", agregar_estafador))
     application.add_handler(CommandHandler("list", listar_estafadores))
     application.add_handler(CommandHandler("s", buscar_estafador))
+    # Búsqueda inline (@bot texto). No bloquea: la espera del debounce no frena otras actualizaciones.
+    application.add_handler(InlineQueryHandler(buscar_estafador_inline, block=False))
 
     # Conversación para enviar reportes
     conv_handler_reporte = ConversationHandler(
@@ -614,19 +1442,67 @@ def main() -> None:
                 CommandHandler("finalizar_fotos", finalizar_fotos), # Comando para terminar el envío de fotos
                 CommandHandler("cancelar", cancelar_reporte) # Permitir cancelar en este estado también
             ],
+            # Sin actividad durante TIMEOUT_REPORTE segundos la conversación termina (requiere JobQueue).
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, reporte_vencido)],
         },
         fallbacks=[CommandHandler("cancelar", cancelar_reporte)], # Comando de fallback global para la conversación
+        conversation_timeout=TIMEOUT_REPORTE,
     )
     application.add_handler(conv_handler_reporte)
 
+    # Importación (archivo .csv o .jsonl enviado por el admin) y exportación de la lista
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension("csv") | filters.Document.FileExtension("jsonl"),
+        importar_estafadores,
+    ))
+    application.add_handler(CommandHandler("export", exportar_estafadores))
+
+    # Moderación en lote de los reportes pendientes
+    application.add_handler(CommandHandler("pendientes", listar_pendientes))
+    application.add_handler(CommandHandler("aprobar", aprobar_reportes))
+    application.add_handler(CommandHandler("rechazar", rechazar_reportes))
+
     # Manejador de callbacks para los botones inline
     application.add_handler(CallbackQueryHandler(button_callback_handler))
 
     # Manejador de errores
     application.add_error_handler(manejar_error)
 
-    # Inicia el polling del bot
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # Latencia y errores de cada manejador, incluidos los estados de la conversación
+    metricas.instrumentar(application)
+    return application
+
+def abrir_datos() -> None:
+    """Carga la lista de estafadores y abre las bases de reportes pendientes y de evidencias."""
+    global pending_reports, indice_evidencias
+    cargar_estafadores()
+    pending_reports = ReportesPendientes(
+        ARCHIVO_REPORTES_PENDIENTES, ttl=TTL_REPORTES_PENDIENTES, maximo=MAX_REPORTES_PENDIENTES
+    )
+    indice_evidencias = IndiceEvidencias(ARCHIVO_EVIDENCIAS)
+
+def main() -> None:
+    """Configura y ejecuta el bot."""
+    abrir_datos() # Carga la lista de estafadores al iniciar el bot
+    application = crear_aplicacion()
+
+    # Solo se piden a Telegram los tipos de actualización que algún manejador atiende
+    tipos = tipos_de_actualizacion(application)
+
+    if MODO_ACTUALIZACIONES == "webhook":
+        asyncio.run(servir_webhook(
+            application,
+            host=WEBHOOK_HOST,
+            puerto=WEBHOOK_PUERTO,
+            ruta=WEBHOOK_RUTA,
+            secreto=SECRETO_WEBHOOK,
+            url=URL_WEBHOOK,
+            allowed_updates=tipos,
+            metricas=metricas,
+        ))
+    else:
+        # Inicia el polling del bot
+        application.run_polling(allowed_updates=tipos)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+Índice de búsqueda aproximada para la lista de estafadores.
+
+El índice se construye una sola vez al cargar la lista y se actualiza de forma
+incremental cada vez que se agrega un estafador o un alias, de modo que /s no
+tenga que reconstruir el corpus en cada consulta.
+
+Las búsquedas aproximadas se pueden ejecutar fuera del event loop con
+EjecutorBusquedas: RapidFuzz libera el GIL mientras puntúa, así que varias
+búsquedas avanzan en paralelo en distintos núcleos.
+
+RapidFuzz se importa recién en la primera búsqueda o al procesar el primer
+alias: con el índice cargado desde la instantánea (ver instantanea.py) el bot
+arranca sin necesitarlo.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from normalizacion import limpiar_usuario, plegar
+
+logger = logging.getLogger(__name__)
+
+# Las búsquedas puntúan los alias en bloques de este tamaño; entre bloque y
+# bloque se revisa si la búsqueda fue cancelada.
+TAMANO_BLOQUE = 50_000
+
+
+class BusquedaCancelada(Exception):
+    pass
+
+
+class BusquedaSaturada(Exception):
+    """Hay demasiadas búsquedas esperando en el ejecutor."""
+
+
+def rapidfuzz():
+    """Módulo rapidfuzz con fuzz, process y utils ya importados."""
+    import rapidfuzz.fuzz
+    import rapidfuzz.process
+    import rapidfuzz.utils
+    return rapidfuzz
+
+
+def comparador(scorer):
+    """Función de puntuación: la recibida o, si es un nombre ("token_sort_ratio"), la de rapidfuzz.fuzz."""
+    return getattr(rapidfuzz().fuzz, scorer) if isinstance(scorer, str) else scorer
+
+
+def procesar(texto):
+    """
+    Forma en la que se indexan y se buscan los alias: sin link ni @, sin acentos
+    y con el procesamiento por defecto de RapidFuzz (minúsculas, sin signos).
+    """
+    texto = limpiar_usuario(texto)
+    if not texto.isascii():
+        texto = plegar(texto)
+    return rapidfuzz().utils.default_process(texto)
+
+
+class IndiceBusqueda:
+    """
+    Corpus de alias (nombre, usuarios CAM4 y usuarios Telegram) ya procesados.
+
+    `cadenas[i]` es el alias normalizado y `referencias[i]` el registro al que
+    pertenece (el registro del estafador o su id, según el almacenamiento). Las cadenas se procesan al insertarlas, así la consulta solo
+    procesa el texto buscado y RapidFuzz puntúa todo el corpus en una llamada.
+
+    No hay prefiltro por n-gramas: con umbral 60, token_sort_ratio da por
+    parecidas cadenas que no comparten ningún trigrama ("aqa" y "gaqita"
+    puntúan 66.7), así que descartar alias sin puntuarlos cambiaría los resultados.
+    """
+
+    def __init__(self):
+        self.cadenas = []
+        self.referencias = []
+
+    def __len__(self):
+        return len(self.cadenas)
+
+    def cargar_precalculado(self, cadenas, referencias):
+        """Reemplaza el índice por uno ya construido: `cadenas` procesadas y sus `referencias`."""
+        self.cadenas = cadenas
+        self.referencias = referencias
+        logger.info("Índice de búsqueda cargado con %s alias.", len(self.cadenas))
+
+    def reconstruir(self, estafadores, obtener_referencia=None):
+        """
+        Reconstruye el índice completo a partir de un iterable de estafadores.
+        `obtener_referencia(estafador)` indica qué guardar como referencia.
+        """
+        self.cadenas = []
+        self.referencias = []
+        for estafador in estafadores:
+            referencia = obtener_referencia(estafador) if obtener_referencia else None
+            self.agregar_estafador(estafador, referencia)
+        logger.info("Índice de búsqueda construido con %s alias.", len(self.cadenas))
+
+    def agregar_estafador(self, estafador, referencia=None):
+        """
+        Indexa el nombre y todos los usuarios de un estafador. Por defecto la
+        referencia guardada es el propio registro.
+        """
+        if referencia is None:
+            referencia = estafador
+        if estafador.nombre:
+            self.agregar(estafador.nombre, referencia)
+        for cam4_user in estafador.cam4_users:
+            self.agregar(cam4_user, referencia)
+        for telegram_user in estafador.telegram_users:
+            self.agregar(telegram_user, referencia)
+
+    def agregar(self, alias, referencia):
+        """Indexa un único alias asociado a un estafador."""
+        self.cadenas.append(procesar(alias))
+        self.referencias.append(referencia)
+
+    def buscar(self, query, limite=20, umbral=60, scorer="token_sort_ratio", estadisticas=None, cancelado=None):
+        """
+        Devuelve hasta `limite` tuplas (alias, puntaje, referencia) con puntaje >= `umbral`,
+        ordenadas de mayor a menor puntaje. `scorer` es una función de puntuación o el
+        nombre de una de rapidfuzz.fuzz.
+
+        Se puntúa todo el corpus, así el resultado es el mismo que el de un único
+        process.extract sobre todos los alias. Si se pasa un diccionario `estadisticas`, se anota en "comparaciones" cuántos
+        alias se puntuaron. Si se pasa un threading.Event `cancelado` y se activa,
+        la búsqueda se interrumpe con BusquedaCancelada al terminar el bloque en curso.
+
+        Puede ejecutarse en otro hilo mientras el event loop agrega alias: los
+        alias solo se agregan al final, así que se trabaja con los `total` que había
+        al empezar y se ignoran los que lleguen durante la búsqueda.
+        """
+        cadenas, referencias = self.cadenas, self.referencias
+        total = len(cadenas)
+        query_procesada = procesar(query)
+        scorer = comparador(scorer)
+        extraer = rapidfuzz().process.extract
+        if estadisticas is not None:
+            estadisticas["comparaciones"] = total
+
+        resultados = []
+        for inicio in range(0, total, TAMANO_BLOQUE):
+            if cancelado is not None and cancelado.is_set():
+                raise BusquedaCancelada(query)
+            bloque = extraer(
+                query_procesada,
+                cadenas[inicio:min(inicio + TAMANO_BLOQUE, total)],
+                scorer=scorer,
+                processor=None,
+                limit=limite,
+                score_cutoff=umbral,
+            )
+            resultados.extend((cadena, puntaje, inicio + indice) for cadena, puntaje, indice in bloque)
+        # Mismo orden que un único process.extract: mayor puntaje primero y, a igual puntaje, el primero indexado.
+        resultados.sort(key=lambda resultado: (-resultado[1], resultado[2]))
+        del resultados[limite:]
+        return [(cadena, puntaje, referencias[indice]) for cadena, puntaje, indice in resultados]
+
+
+class CacheResultados:
+    """
+    Caché LRU de resultados por consulta normalizada (completa: el resultado de un
+    prefijo no sirve para acotar el de una consulta más larga).
+
+    Cada entrada guarda la generación del registro con la que se calculó: si el
+    registro cambió, la entrada se descarta al consultarla, sin vaciar todo.
+    `aciertos` y `fallos` cuentan las consultas servidas desde la caché y las que no.
+    """
+
+    def __init__(self, maximo=1000):
+        self.maximo = maximo
+        self._entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obtener(self, clave, generacion):
+        """Devuelve el valor guardado para `clave` si sigue vigente, o None."""
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            self.fallos += 1
+            return None
+        generacion_entrada, valor = entrada
+        if generacion_entrada != generacion:
+            del self._entradas[clave]
+            self.fallos += 1
+            return None
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return valor
+
+    def guardar(self, clave, generacion, valor):
+        self._entradas[clave] = (generacion, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.maximo:
+            self._entradas.popitem(last=False)
+
+
+class EjecutorBusquedas:
+    """
+    Pool de hilos acotado para las búsquedas aproximadas.
+
+    Acepta hasta `max_en_cola` búsquedas a la vez (en ejecución o esperando un
+    hilo); por encima de eso `ejecutar` lanza BusquedaSaturada en lugar de
+    encolar más trabajo. Una búsqueda que supera `timeout` segundos se cancela
+    (deja de puntuar al terminar el bloque en curso) y `ejecutar` lanza asyncio.TimeoutError.
+    """
+
+    def __init__(self, hilos=None, max_en_cola=64, timeout=10.0):
+        self.hilos = hilos or min(4, os.cpu_count() or 1)
+        self.max_en_cola = max_en_cola
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="busqueda")
+        self.en_curso = 0
+        self.rechazadas = 0
+        self.vencidas = 0
+
+    async def ejecutar(self, funcion, *args, **kwargs):
+        """Ejecuta `funcion(*args, cancelado=evento, **kwargs)` en el pool y devuelve su resultado."""
+        if self.en_curso >= self.max_en_cola:
+            self.rechazadas += 1
+            raise BusquedaSaturada()
+
+        cancelado = threading.Event()
+        loop = asyncio.get_running_loop()
+        self.en_curso += 1
+        try:
+            futuro = loop.run_in_executor(self._pool, lambda: funcion(*args, cancelado=cancelado, **kwargs))
+            return await asyncio.wait_for(futuro, self.timeout)
+        except asyncio.TimeoutError:
+            self.vencidas += 1
+            raise
+        finally:
+            # Si se venció o se canceló la tarea que esperaba, el hilo deja de trabajar.
+            cancelado.set()
+            self.en_curso -= 1
+
+    def cerrar(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,84 @@
+"""
+Procesamiento concurrente de actualizaciones con orden por usuario.
+
+Con `concurrent_updates` la Application atiende varias actualizaciones a la vez,
+así una búsqueda lenta o la subida de un reporte no frenan a los demás usuarios.
+Pero la conversación de /r guarda su estado recién al terminar cada paso: si dos
+mensajes del mismo usuario se atendieran a la vez, ambos verían el estado
+anterior. ProcesadorPorUsuario atiende en paralelo las actualizaciones de
+usuarios distintos y de a una, en orden de llegada, las de un mismo usuario.
+
+Modelo de concurrencia del registro: todo corre en el event loop salvo la
+puntuación aproximada, que lee el índice de búsqueda desde el pool de hilos.
+- Las escrituras (fusionar, fusionar_lote, reportes pendientes) son llamadas
+  síncronas sin `await` en el medio, así que el event loop ya las serializa y
+  ningún manejador ve un cambio a medias.
+- El índice de búsqueda solo crece al final; cada búsqueda trabaja con los
+  alias que había al empezar (una vista fija aunque se agreguen otros mientras
+  tanto), y el resultado se guarda en caché con la generación del comienzo.
+"""
+import asyncio
+import logging
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+def clave_usuario(update):
+    """Usuario (o chat, si no hay usuario) cuyas actualizaciones deben ir en orden, o None."""
+    usuario = getattr(update, "effective_user", None)
+    if usuario is not None:
+        return usuario.id
+    chat = getattr(update, "effective_chat", None)
+    return chat.id if chat is not None else None
+
+
+class ProcesadorPorUsuario(BaseUpdateProcessor):
+    """
+    Hasta `max_concurrent_updates` actualizaciones a la vez, pero de a una por usuario.
+
+    Cada usuario con actualizaciones en curso tiene un asyncio.Lock (que atiende a
+    quienes esperan en orden de llegada); se descarta cuando no queda ninguna
+    pendiente, así el diccionario no crece con cada usuario que alguna vez escribió.
+    Se toma primero el turno del usuario y después un lugar del límite global: las
+    actualizaciones que esperan detrás de otra del mismo usuario no ocupan lugares,
+    así la ráfaga de un usuario no frena a los demás.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        # clave de usuario -> [lock, actualizaciones en curso o esperando]
+        self._turnos = {}
+
+    @property
+    def usuarios_activos(self):
+        return len(self._turnos)
+
+    async def process_update(self, update, coroutine):
+        clave = clave_usuario(update)
+        if clave is None:
+            await super().process_update(update, coroutine)
+            return
+
+        turno = self._turnos.get(clave)
+        if turno is None:
+            turno = self._turnos[clave] = [asyncio.Lock(), 0]
+        turno[1] += 1
+        try:
+            async with turno[0]:
+                # El lugar global (semáforo de BaseUpdateProcessor) se pide recién con el turno.
+                await super().process_update(update, coroutine)
+        finally:
+            turno[1] -= 1
+            if not turno[1]:
+                del self._turnos[clave]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
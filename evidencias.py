@@ -0,0 +1,85 @@
+"""
+Índice de fotos de evidencia ya publicadas en el canal.
+
+Telegram identifica cada archivo con un `file_unique_id` que es el mismo aunque
+la foto se reenvíe desde otro chat o la mande otro usuario. El índice guarda,
+para cada foto, el primer mensaje del canal en el que se publicó, así un reporte
+con capturas repetidas puede enlazar ese mensaje en lugar de volver a subirlas.
+Vive en una base SQLite pequeña para sobrevivir a reinicios.
+"""
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS evidencias (
+    file_unique_id TEXT PRIMARY KEY,
+    message_id INTEGER NOT NULL,
+    report_id TEXT,
+    creado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_evidencias_message_id ON evidencias (message_id);
+"""
+
+
+def enlace_mensaje(chat_id, message_id):
+    """Link a un mensaje de un canal o supergrupo (ids -100...), o None si el chat no tiene links de ese tipo."""
+    chat = str(chat_id)
+    if not chat.startswith("-100"):
+        return None
+    return f"https://t.me/c/{chat[4:]}/{message_id}"
+
+
+class IndiceEvidencias:
+    """Relación file_unique_id -> message_id del canal, respaldada por SQLite."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(ESQUEMA)
+        self.conexion.commit()
+
+    def __len__(self):
+        return self.conexion.execute("SELECT COUNT(*) FROM evidencias").fetchone()[0]
+
+    def buscar(self, file_unique_ids):
+        """Devuelve {file_unique_id: message_id} para las fotos de la lista que ya se publicaron."""
+        file_unique_ids = list(file_unique_ids)
+        if not file_unique_ids:
+            return {}
+        marcas = ", ".join("?" * len(file_unique_ids))
+        filas = self.conexion.execute(
+            f"SELECT file_unique_id, message_id FROM evidencias WHERE file_unique_id IN ({marcas})",
+            file_unique_ids,
+        )
+        return dict(filas)
+
+    def registrar(self, publicadas, report_id=None):
+        """
+        Guarda las fotos publicadas, como pares (file_unique_id, message_id), en una
+        sola transacción. Si una foto ya estaba se conserva su primer mensaje.
+        """
+        ahora = time.time()
+        with self.conexion:
+            self.conexion.executemany(
+                "INSERT OR IGNORE INTO evidencias (file_unique_id, message_id, report_id, creado) VALUES (?, ?, ?, ?)",
+                [(file_unique_id, message_id, report_id, ahora) for file_unique_id, message_id in publicadas],
+            )
+
+    def olvidar_mensaje(self, message_id):
+        """Quita las fotos que apuntan a un mensaje borrado del canal. Devuelve cuántas se quitaron."""
+        return self.olvidar_mensajes([message_id])
+
+    def olvidar_mensajes(self, message_ids):
+        """Como `olvidar_mensaje`, para varios mensajes en una sola transacción."""
+        with self.conexion:
+            return self.conexion.executemany(
+                "DELETE FROM evidencias WHERE message_id = ?", [(message_id,) for message_id in message_ids]
+            ).rowcount
+
+    def cerrar(self):
+        self.conexion.close()
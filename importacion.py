@@ -0,0 +1,167 @@
+"""
+Importación y exportación masiva de la lista de estafadores.
+
+Formatos admitidos:
+
+- JSONL: un objeto por línea, con el formato de estafadores.json
+  ({"nombre": ..., "cam4_users": [...], "telegram_users": [...]}) o con un solo
+  usuario por campo ({"nombre": ..., "cam4": ..., "telegram": ...}).
+- CSV: columnas nombre, cam4_users, telegram_users (con o sin encabezado); si
+  hay varios usuarios en una celda se separan con "|".
+
+Los archivos se leen y escriben línea por línea, sin cargarlos enteros en memoria.
+"""
+import csv
+import json
+import logging
+
+from normalizacion import limpiar_usuario
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = ("csv", "jsonl")
+
+MAX_LARGO_NOMBRE = 100
+MAX_LARGO_USUARIO = 64
+# Separador de varios usuarios dentro de una celda CSV.
+SEPARADOR_USUARIOS = "|"
+COLUMNAS_CSV = ("nombre", "cam4_users", "telegram_users")
+# Nombres alternativos de las columnas o claves, por comodidad de quien arma el archivo.
+SINONIMOS = {
+    "cam4": "cam4_users",
+    "user_cam4": "cam4_users",
+    "usuario_cam4": "cam4_users",
+    "telegram": "telegram_users",
+    "user_telegram": "telegram_users",
+    "usuario_telegram": "telegram_users",
+}
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+def _usuarios(valor):
+    if valor is None:
+        return []
+    if isinstance(valor, str):
+        valores = valor.split(SEPARADOR_USUARIOS)
+    elif isinstance(valor, list):
+        valores = valor
+    else:
+        raise FilaInvalida("los usuarios deben ser texto o una lista de textos")
+
+    usuarios = []
+    for usuario in valores:
+        if not isinstance(usuario, str):
+            raise FilaInvalida("los usuarios deben ser texto")
+        usuario = limpiar_usuario(usuario)
+        if not usuario:
+            continue
+        if len(usuario) > MAX_LARGO_USUARIO:
+            raise FilaInvalida(f"usuario demasiado largo: {usuario[:20]}...")
+        if any(caracter.isspace() for caracter in usuario):
+            raise FilaInvalida(f"usuario con espacios: {usuario}")
+        usuarios.append(usuario)
+    return usuarios
+
+
+def validar_fila(datos):
+    """
+    Valida un registro (diccionario con nombre y usuarios) y devuelve
+    (nombre, usuarios_cam4, usuarios_telegram). Lanza FilaInvalida si no sirve.
+    """
+    if not isinstance(datos, dict):
+        raise FilaInvalida("se esperaba un objeto")
+    datos = {SINONIMOS.get(clave.strip().lower(), clave.strip().lower()): valor for clave, valor in datos.items()}
+
+    nombre = datos.get("nombre")
+    if not isinstance(nombre, str) or not nombre.strip():
+        raise FilaInvalida("falta el nombre")
+    nombre = nombre.strip()
+    if len(nombre) > MAX_LARGO_NOMBRE:
+        raise FilaInvalida("nombre demasiado largo")
+
+    cam4_users = _usuarios(datos.get("cam4_users"))
+    telegram_users = _usuarios(datos.get("telegram_users"))
+    if not cam4_users and not telegram_users:
+        raise FilaInvalida("no tiene usuarios de CAM4 ni de Telegram")
+    return nombre, cam4_users, telegram_users
+
+
+def _registros_jsonl(archivo):
+    for numero, linea in enumerate(archivo, 1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            yield numero, json.loads(linea)
+        except json.JSONDecodeError:
+            yield numero, FilaInvalida("JSON inválido")
+
+
+def _registros_csv(archivo):
+    lector = csv.reader(archivo)
+    columnas = COLUMNAS_CSV
+    primera = True
+    try:
+        for celdas in lector:
+            if not any(celda.strip() for celda in celdas):
+                continue
+            claves = [SINONIMOS.get(celda.strip().lower(), celda.strip().lower()) for celda in celdas]
+            if primera and "nombre" in claves:
+                primera = False
+                columnas = claves
+                continue
+            primera = False
+            # line_num cuenta líneas físicas (la última del registro), aunque una celda entre comillas tenga saltos de línea.
+            yield lector.line_num, dict(zip(columnas, celdas))
+    except csv.Error as e:
+        yield lector.line_num, FilaInvalida(f"CSV inválido ({e}); el resto no se leyó")
+
+
+def leer_importacion(ruta, formato, max_filas=50000):
+    """
+    Lee y valida un archivo CSV o JSONL. Devuelve (filas, errores): `filas` es una
+    lista de (nombre, usuarios_cam4, usuarios_telegram) y `errores` una lista de
+    (número de línea, motivo). Deja de leer al superar `max_filas` filas, o al
+    encontrar texto que no es UTF-8 o un CSV mal formado.
+    """
+    filas = []
+    errores = []
+    numero = 0
+    with open(ruta, "r", encoding="utf-8-sig", newline="") as archivo:
+        registros = _registros_csv(archivo) if formato == "csv" else _registros_jsonl(archivo)
+        try:
+            for numero, datos in registros:
+                if len(filas) + len(errores) >= max_filas:
+                    errores.append((numero, f"se superó el máximo de {max_filas} filas; el resto no se leyó"))
+                    break
+                try:
+                    if isinstance(datos, FilaInvalida):
+                        raise datos
+                    filas.append(validar_fila(datos))
+                except FilaInvalida as e:
+                    errores.append((numero, str(e)))
+        except UnicodeDecodeError:
+            # El archivo se decodifica por bloques: la línea es la siguiente a la última leída bien.
+            errores.append((numero + 1, "el archivo no es UTF-8; el resto no se leyó"))
+    logger.info("Importación de %s: %s filas válidas, %s con errores.", ruta, len(filas), len(errores))
+    return filas, errores
+
+
+def escribir_exportacion(estafadores, ruta, formato):
+    """Escribe una lista de estafadores (formato de estafadores.json) en CSV o JSONL."""
+    with open(ruta, "w", encoding="utf-8", newline="") as archivo:
+        if formato == "csv":
+            escritor = csv.writer(archivo)
+            escritor.writerow(COLUMNAS_CSV)
+            for estafador in estafadores:
+                escritor.writerow((
+                    estafador["nombre"],
+                    SEPARADOR_USUARIOS.join(estafador["cam4_users"]),
+                    SEPARADOR_USUARIOS.join(estafador["telegram_users"]),
+                ))
+        else:
+            for estafador in estafadores:
+                archivo.write(json.dumps(estafador, ensure_ascii=False) + "\n")
@@ -0,0 +1,246 @@
+"""
+Instantánea binaria de la lista de estafadores para arrancar rápido.
+
+Cargar estafadores.json obliga a parsear todo el JSON, calcular la clave
+canónica de cada usuario y procesar cada alias para armar el índice de
+búsqueda. La instantánea, escrita junto al JSON, guarda todo eso ya calculado:
+
+- los registros (nombre y usuarios) y las claves canónicas de los usuarios,
+- las cadenas procesadas del índice de búsqueda y el registro de cada una.
+
+Los textos van en bloques UTF-8 separados por "\\0" (se decodifican con un solo
+split) y los números en arreglos de enteros sin signo de 32 bits. El archivo se
+abre con mmap y se lee sin copias intermedias.
+
+La instantánea guarda el tamaño, la fecha de modificación y el SHA-256 del JSON
+del que salió. Solo se usa si el JSON sigue siendo ese; si no, se ignora y se
+vuelve a escribir después de cargar el JSON.
+"""
+import gc
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from normalizacion import clave_alias
+
+logger = logging.getLogger(__name__)
+
+MAGIA = b"ESTAFSNP"
+# Subir si cambia el formato o la forma de calcular las claves o las cadenas del índice.
+VERSION = 2
+SEPARADOR = "\0"
+# magia, versión, orden de bytes (0 little, 1 big), tamaño del JSON, mtime_ns del JSON, SHA-256 del JSON, secciones
+CABECERA = struct.Struct("<8sHHQq32sI")
+# nombre, desplazamiento, largo
+SECCION = struct.Struct("<8sQQ")
+ALINEACION = 8
+
+
+class InstantaneaInvalida(ValueError):
+    pass
+
+
+def huella_json(ruta):
+    """(tamaño, mtime_ns, sha256) del archivo JSON."""
+    estado = os.stat(ruta)
+    sha256 = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(bloque)
+    return estado.st_size, estado.st_mtime_ns, sha256.digest()
+
+
+def _coincide_json(ruta_json, tamano, mtime_ns, sha256):
+    """Compara por tamaño y fecha; si solo cambió la fecha (copia, touch), por contenido."""
+    try:
+        estado = os.stat(ruta_json)
+    except FileNotFoundError:
+        return False
+    if estado.st_size != tamano:
+        return False
+    if estado.st_mtime_ns == mtime_ns:
+        return True
+    return huella_json(ruta_json)[2] == sha256
+
+
+def _unir(textos):
+    """Bloque UTF-8 con los textos separados por "\\0". Falla si algún texto contiene el separador."""
+    textos = list(textos)
+    unido = SEPARADOR.join(textos)
+    if unido.count(SEPARADOR) != max(len(textos) - 1, 0):
+        raise InstantaneaInvalida("un texto contiene el carácter nulo")
+    return unido.encode("utf-8")
+
+
+def _separar(datos, cantidad):
+    if not cantidad:
+        return []
+    textos = bytes(datos).decode("utf-8").split(SEPARADOR)
+    if len(textos) != cantidad:
+        raise InstantaneaInvalida("cantidad de textos inesperada")
+    return textos
+
+
+def escribir_instantanea(ruta, ruta_json, registro, indice):
+    """
+    Escribe de forma atómica la instantánea de `registro` (RegistroMemoria) e
+    `indice` (IndiceBusqueda), que deben reflejar exactamente el contenido actual
+    de `ruta_json`.
+    """
+    estafadores = list(registro.iterar())
+    numero = {id(estafador): i for i, estafador in enumerate(estafadores)}
+
+    textos = []
+    claves = []
+    cuentas = array("I")
+    for estafador in estafadores:
+        textos.append(estafador.nombre)
+        textos.extend(estafador.cam4_users)
+        textos.extend(estafador.telegram_users)
+        claves.extend(clave_alias(usuario) for usuario in estafador.cam4_users)
+        claves.extend(clave_alias(usuario) for usuario in estafador.telegram_users)
+        cuentas.append(len(estafador.cam4_users))
+        cuentas.append(len(estafador.telegram_users))
+
+    referencias = array("I", (numero[id(referencia)] for referencia in indice.referencias))
+
+    secciones = [
+        (b"textos", _unir(textos)),
+        (b"claves", _unir(claves)),
+        (b"cuentas", cuentas.tobytes()),
+        (b"cadenas", _unir(indice.cadenas)),
+        (b"refs", referencias.tobytes()),
+    ]
+    cantidades = struct.pack("<3Q", len(estafadores), len(indice.cadenas), len(claves))
+    secciones.insert(0, (b"conteos", cantidades))
+
+    tamano, mtime_ns, sha256 = huella_json(ruta_json)
+    orden = 0 if sys.byteorder == "little" else 1
+    cabecera = CABECERA.pack(MAGIA, VERSION, orden, tamano, mtime_ns, sha256, len(secciones))
+    desplazamiento = CABECERA.size + SECCION.size * len(secciones)
+    tabla = []
+    cuerpo = []
+    for nombre, datos in secciones:
+        relleno = -desplazamiento % ALINEACION
+        cuerpo.append(b"\0" * relleno)
+        desplazamiento += relleno
+        tabla.append(SECCION.pack(nombre, desplazamiento, len(datos)))
+        cuerpo.append(datos)
+        desplazamiento += len(datos)
+
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    descriptor, ruta_temporal = tempfile.mkstemp(prefix=f".{os.path.basename(ruta)}.", suffix=".tmp", dir=directorio)
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(cabecera)
+            f.writelines(tabla)
+            f.writelines(cuerpo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ruta_temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(ruta_temporal)
+        except OSError:
+            pass
+        raise
+    logger.info("Instantánea %s escrita (%s estafadores, %s alias, %s bytes).",
+                ruta, len(estafadores), len(indice.cadenas), desplazamiento)
+
+
+def cargar_instantanea(ruta, ruta_json, registro, indice):
+    """
+    Si `ruta` es una instantánea válida de `ruta_json`, carga con ella `registro`
+    e `indice` y devuelve True. Si no existe, está vencida o dañada, devuelve
+    False y hay que cargarlos desde el JSON.
+    """
+    try:
+        with open(ruta, "rb") as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        # ValueError: archivo vacío.
+        return False
+    # Se crean millones de objetos y ninguno es basura: el recolector de ciclos
+    # solo agregaría pasadas sobre ellos (casi la mitad del tiempo de carga).
+    recolector_activo = gc.isenabled()
+    gc.disable()
+    try:
+        registros, cadenas, numeros_referencia = _leer(mapa, ruta_json)
+        registro.cargar_precalculado(registros)
+        estafadores = registro.estafadores
+        indice.cargar_precalculado(cadenas, [estafadores[i] for i in numeros_referencia])
+    except InstantaneaInvalida as e:
+        logger.info("No se usa la instantánea %s: %s.", ruta, e)
+        return False
+    except (struct.error, UnicodeDecodeError, TypeError, IndexError, KeyError) as e:
+        logger.warning("Instantánea %s dañada (%s); se carga el JSON.", ruta, e)
+        return False
+    finally:
+        if recolector_activo:
+            gc.enable()
+    return True
+
+
+def _leer(mapa, ruta_json):
+    vista = memoryview(mapa)
+    magia, version, orden, tamano, mtime_ns, sha256, cantidad = CABECERA.unpack_from(vista, 0)
+    if magia != MAGIA or version != VERSION:
+        raise InstantaneaInvalida("formato desconocido")
+    if orden != (0 if sys.byteorder == "little" else 1):
+        raise InstantaneaInvalida("escrita en una máquina con otro orden de bytes")
+    if not _coincide_json(ruta_json, tamano, mtime_ns, sha256):
+        raise InstantaneaInvalida("el JSON cambió")
+
+    secciones = {}
+    for i in range(cantidad):
+        nombre, desplazamiento, largo = SECCION.unpack_from(vista, CABECERA.size + SECCION.size * i)
+        if desplazamiento + largo > len(vista):
+            raise InstantaneaInvalida("archivo truncado")
+        secciones[nombre.rstrip(b"\0")] = vista[desplazamiento:desplazamiento + largo]
+
+    personas, alias_indice, cantidad_claves = struct.unpack("<3Q", secciones[b"conteos"])
+    cuentas = secciones[b"cuentas"].cast("I")
+    if len(cuentas) != 2 * personas:
+        raise InstantaneaInvalida("cantidad de registros inesperada")
+    textos = _separar(secciones[b"textos"], personas + cantidad_claves)
+    claves = _separar(secciones[b"claves"], cantidad_claves)
+
+    registros = []
+    posicion_texto = 0
+    posicion_clave = 0
+    for i in range(personas):
+        cantidad_cam4 = cuentas[2 * i]
+        cantidad_telegram = cuentas[2 * i + 1]
+        nombre = textos[posicion_texto]
+        posicion_texto += 1
+        cam4_users = textos[posicion_texto:posicion_texto + cantidad_cam4]
+        posicion_texto += cantidad_cam4
+        telegram_users = textos[posicion_texto:posicion_texto + cantidad_telegram]
+        posicion_texto += cantidad_telegram
+        cam4_claves = claves[posicion_clave:posicion_clave + cantidad_cam4]
+        posicion_clave += cantidad_cam4
+        telegram_claves = claves[posicion_clave:posicion_clave + cantidad_telegram]
+        posicion_clave += cantidad_telegram
+        registros.append((nombre, cam4_users, cam4_claves, telegram_users, telegram_claves))
+
+    cadenas = _separar(secciones[b"cadenas"], alias_indice)
+    numeros_referencia = secciones[b"refs"].cast("I")
+    if len(numeros_referencia) != alias_indice or max(numeros_referencia, default=0) >= max(personas, 1):
+        raise InstantaneaInvalida("índice de búsqueda inconsistente")
+    return registros, cadenas, numeros_referencia
+
+
+def instantanea_vigente(ruta, ruta_json):
+    """True si `ruta` es una instantánea de este formato que corresponde al contenido actual de `ruta_json`."""
+    try:
+        with open(ruta, "rb") as f:
+            datos = f.read(CABECERA.size)
+        magia, version, _, tamano, mtime_ns, sha256, _ = CABECERA.unpack(datos)
+    except (FileNotFoundError, struct.error):
+        return False
+    return magia == MAGIA and version == VERSION and _coincide_json(ruta_json, tamano, mtime_ns, sha256)
@@ -0,0 +1,267 @@
+"""
+Limitación de tasa para las llamadas a la API de Telegram.
+
+`LimitadorTasa` implementa un "token bucket": se acumulan `tasa` fichas por
+segundo hasta un máximo de `capacidad`, y cada llamada consume una. Permite
+ráfagas cortas y reparte el resto de las llamadas en el tiempo en lugar de usar
+pausas fijas. Cuando hay que esperar, se atiende primero a quien tenga menor
+número de prioridad.
+
+`PlanificadorEnvios` usa esos limitadores como `rate_limiter` de la Application,
+así todas las llamadas salientes del bot pasan por él: un límite global, uno por
+chat y reintento automático cuando Telegram responde con RetryAfter.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict, defaultdict
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class LimitadorTasa:
+    def __init__(self, tasa, capacidad=1):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._fichas = capacidad
+        self._ultima_recarga = time.monotonic()
+        # Cola de espera: (prioridad, orden de llegada, costo, future).
+        self._espera = []
+        self._orden = itertools.count()
+        self._temporizador = None
+
+    @property
+    def en_espera(self):
+        return len(self._espera)
+
+    @property
+    def inactivo(self):
+        """True si el balde está lleno y nadie espera: descartarlo no cambia nada."""
+        self._recargar()
+        return not self._espera and self._fichas >= self.capacidad
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultima_recarga) * self.tasa)
+        self._ultima_recarga = ahora
+
+    async def adquirir(self, costo=1, prioridad=0):
+        """
+        Espera hasta que haya `costo` fichas disponibles y las consume.
+        Devuelve los segundos esperados.
+
+        Un costo mayor que la capacidad espera solo a que el balde se llene y lo deja
+        en deuda: la llamada siguiente espera lo que falta.
+        """
+        self._recargar()
+        if not self._espera and self._fichas >= min(costo, self.capacidad):
+            self._fichas -= costo
+            return 0.0
+
+        inicio = time.monotonic()
+        futuro = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._espera, (prioridad, next(self._orden), costo, futuro))
+        self._despachar()
+        await futuro
+        return time.monotonic() - inicio
+
+    def _despachar(self):
+        self._recargar()
+        while self._espera:
+            _, _, costo, futuro = self._espera[0]
+            if futuro.done():
+                # Quien esperaba fue cancelado.
+                heapq.heappop(self._espera)
+                continue
+            if self._fichas < min(costo, self.capacidad):
+                break
+            heapq.heappop(self._espera)
+            self._fichas -= costo
+            futuro.set_result(None)
+
+        if self._espera and self._temporizador is None:
+            demora = (min(self._espera[0][2], self.capacidad) - self._fichas) / self.tasa
+            self._temporizador = asyncio.get_running_loop().call_later(demora, self._al_vencer_temporizador)
+
+    def _al_vencer_temporizador(self):
+        self._temporizador = None
+        self._despachar()
+
+    def pausar(self, segundos):
+        """Deja de entregar fichas durante `segundos` (por ejemplo, tras un RetryAfter)."""
+        self._recargar()
+        self._fichas = min(self._fichas, 0) - segundos * self.tasa
+
+    async def __aenter__(self):
+        await self.adquirir()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class PlanificadorEnvios(BaseRateLimiter):
+    """
+    Rate limiter para la Application de python-telegram-bot.
+
+    Cada solicitud espera primero al límite de su chat (los chats privados y los
+    grupos/canales tienen tasas distintas) y después al límite global. La
+    prioridad se toma de `rate_limit_args={"prioridad": n}` si se pasa, o de
+    `clasificar(endpoint, data)`; a menor número, antes se atiende. Un álbum
+    (sendMediaGroup) consume una ficha por foto. Ante un RetryAfter se pausan el
+    límite global y el del chat por el tiempo indicado y se reintenta hasta
+    `max_reintentos` veces.
+
+    Si se pasa `metricas`, cada llamada se informa con
+    `metricas.registrar_llamada(endpoint, segundos, espera, error)`.
+    """
+
+    # Endpoints que no cuentan como mensajes enviados a un chat.
+    SIN_LIMITE_CHAT = frozenset({"answerCallbackQuery", "answerInlineQuery", "getFile", "getMe"})
+
+    def __init__(
+        self,
+        tasa_global=30,
+        tasa_chat=1,
+        rafaga_chat=3,
+        tasa_grupo=20 / 60,
+        rafaga_grupo=3,
+        clasificar=None,
+        max_reintentos=3,
+        max_chats=5000,
+        metricas=None,
+    ):
+        self.limitador_global = LimitadorTasa(tasa_global, capacidad=tasa_global)
+        self.tasa_chat = tasa_chat
+        self.rafaga_chat = rafaga_chat
+        self.tasa_grupo = tasa_grupo
+        self.rafaga_grupo = rafaga_grupo
+        self.clasificar = clasificar
+        self.max_reintentos = max_reintentos
+        self.max_chats = max_chats
+        self._metricas = metricas
+        self._limitadores_chat = OrderedDict()
+
+        self._en_cola = defaultdict(int)
+        self._solicitudes = defaultdict(int)
+        self._espera_total = defaultdict(float)
+        self._espera_maxima = defaultdict(float)
+        self._reintentos = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _limitador_chat(self, chat_id):
+        limitador = self._limitadores_chat.get(chat_id)
+        if limitador is None:
+            es_grupo = isinstance(chat_id, str) or chat_id < 0
+            if es_grupo:
+                limitador = LimitadorTasa(self.tasa_grupo, capacidad=self.rafaga_grupo)
+            else:
+                limitador = LimitadorTasa(self.tasa_chat, capacidad=self.rafaga_chat)
+            self._limitadores_chat[chat_id] = limitador
+            self._descartar_limitadores_inactivos()
+        else:
+            self._limitadores_chat.move_to_end(chat_id)
+        return limitador
+
+    def _descartar_limitadores_inactivos(self):
+        # Se descartan los chats menos usados recientemente, siempre que estén inactivos.
+        while len(self._limitadores_chat) > self.max_chats:
+            chat_id, limitador = next(iter(self._limitadores_chat.items()))
+            if not limitador.inactivo:
+                break
+            del self._limitadores_chat[chat_id]
+
+    def _prioridad(self, endpoint, data, rate_limit_args):
+        if isinstance(rate_limit_args, dict) and "prioridad" in rate_limit_args:
+            return rate_limit_args["prioridad"]
+        if self.clasificar is not None:
+            return self.clasificar(endpoint, data)
+        return 0
+
+    @staticmethod
+    def _costo(endpoint, data):
+        """
+        Fichas que consume una llamada: Telegram cuenta cada foto de un álbum como
+        un mensaje. Si superan la capacidad de un balde, `adquirir` lo deja en deuda.
+        """
+        if endpoint == "sendMediaGroup":
+            return max(1, len(data.get("media") or ()))
+        return 1
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        prioridad = self._prioridad(endpoint, data, rate_limit_args)
+        costo = self._costo(endpoint, data)
+        chat_id = data.get("chat_id")
+        limitador_chat = None
+        if chat_id is not None and endpoint not in self.SIN_LIMITE_CHAT:
+            limitador_chat = self._limitador_chat(chat_id)
+
+        for intento in range(self.max_reintentos + 1):
+            self._en_cola[prioridad] += 1
+            try:
+                espera = 0.0
+                if limitador_chat is not None:
+                    espera += await limitador_chat.adquirir(costo, prioridad=prioridad)
+                espera += await self.limitador_global.adquirir(costo, prioridad=prioridad)
+            finally:
+                self._en_cola[prioridad] -= 1
+            self._solicitudes[prioridad] += 1
+            self._espera_total[prioridad] += espera
+            self._espera_maxima[prioridad] = max(self._espera_maxima[prioridad], espera)
+
+            inicio = time.perf_counter()
+            error = None
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                error = "RetryAfter"
+                if intento == self.max_reintentos:
+                    raise
+                segundos = e.retry_after
+                if hasattr(segundos, "total_seconds"):
+                    segundos = segundos.total_seconds()
+                self._reintentos += 1
+                logger.warning(
+                    "RetryAfter de %ss en %s (chat %s). Reintento %s de %s.",
+                    segundos, endpoint, chat_id, intento + 1, self.max_reintentos,
+                )
+                self.limitador_global.pausar(segundos)
+                if limitador_chat is not None:
+                    limitador_chat.pausar(segundos)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                if self._metricas is not None:
+                    self._metricas.registrar_llamada(endpoint, time.perf_counter() - inicio, espera, error)
+
+    def metricas(self):
+        """Profundidad de cola y tiempos de espera por prioridad, más los reintentos por RetryAfter."""
+        prioridades = sorted(set(self._en_cola) | set(self._solicitudes))
+        return {
+            "reintentos": self._reintentos,
+            "chats_con_limitador": len(self._limitadores_chat),
+            "prioridades": {
+                prioridad: {
+                    "en_cola": self._en_cola[prioridad],
+                    "solicitudes": self._solicitudes[prioridad],
+                    "espera_total": self._espera_total[prioridad],
+                    "espera_maxima": self._espera_maxima[prioridad],
+                    "espera_media": (
+                        self._espera_total[prioridad] / self._solicitudes[prioridad]
+                        if self._solicitudes[prioridad] else 0.0
+                    ),
+                }
+                for prioridad in prioridades
+            },
+        }
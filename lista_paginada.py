@@ -0,0 +1,84 @@
+"""
+Páginas ya armadas del comando /list.
+
+Las vistas ordenadas y el texto de cada página se calculan una sola vez por
+versión de la lista de estafadores (su `generacion`) y se reutilizan hasta que
+la lista cambie, así pasar de página no vuelve a ordenar ni a armar texto.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Telegram admite hasta 4096 caracteres por mensaje; se deja margen para el encabezado.
+MAX_CARACTERES_PAGINA = 3500
+ITEMS_POR_PAGINA = 60
+
+SECCIONES = (
+    ("nombre", "Nombres Completos"),
+    ("cam4_users", "Usuarios CAM4"),
+    ("telegram_users", "Usuarios Telegram"),
+)
+
+
+class ListadoPaginado:
+    def __init__(self, max_caracteres=MAX_CARACTERES_PAGINA, items_por_pagina=ITEMS_POR_PAGINA):
+        self.max_caracteres = max_caracteres
+        self.items_por_pagina = items_por_pagina
+        self._version = None
+        self._paginas = []
+
+    def paginas(self, registro):
+        """Devuelve las páginas de la lista, armándolas de nuevo solo si el registro cambió."""
+        version = (id(registro), registro.generacion)
+        if version != self._version:
+            self._paginas = self._armar(registro)
+            self._version = version
+            logger.info("Listado de estafadores armado en %s páginas.", len(self._paginas))
+        return self._paginas
+
+    def _armar(self, registro):
+        cuerpos = []
+        lineas = []
+        largo = 0
+        items = 0
+
+        def cerrar_pagina():
+            nonlocal lineas, largo, items
+            cuerpos.append("\n".join(lineas))
+            lineas, largo, items = [], 0, 0
+
+        for campo, titulo in SECCIONES:
+            valores = registro.valores_ordenados(campo)
+            if not valores:
+                linea = f"**{titulo}:** (Ninguno registrado)"
+                if largo + len(linea) > self.max_caracteres:
+                    cerrar_pagina()
+                lineas += [linea, ""]
+                largo += len(linea) + 2
+                continue
+
+            con_encabezado = False
+            for i, valor in enumerate(valores, 1):
+                linea = f"{i}. {valor}"
+                if items >= self.items_por_pagina or largo + len(linea) + len(titulo) + 16 > self.max_caracteres:
+                    cerrar_pagina()
+                    con_encabezado = False
+                if not con_encabezado:
+                    encabezado = f"**{titulo}:**" if i == 1 else f"**{titulo} (cont.):**"
+                    lineas.append(encabezado)
+                    largo += len(encabezado) + 1
+                    con_encabezado = True
+                lineas.append(linea)
+                largo += len(linea) + 1
+                items += 1
+            lineas.append("")
+            largo += 1
+
+        if lineas:
+            cerrar_pagina()
+
+        total = len(cuerpos)
+        return [
+            f"--- Lista de Estafadores --- (página {numero}/{total})\n\n{cuerpo}"
+            for numero, cuerpo in enumerate(cuerpos, 1)
+        ]
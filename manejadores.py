@@ -0,0 +1,64 @@
+"""
+Recorrido de los manejadores registrados en una Application.
+
+Lo usan las métricas (para envolver cada callback) y el arranque del bot (para
+pedir a Telegram solo los tipos de actualización que algún manejador atiende).
+"""
+import logging
+
+from telegram import Update
+from telegram.ext import (
+    CallbackQueryHandler,
+    CommandHandler,
+    ConversationHandler,
+    InlineQueryHandler,
+    MessageHandler,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tipo de actualización que atiende cada clase de manejador. Los mensajes editados
+# se dejan fuera a propósito: los comandos responden con update.message, que en
+# una edición no existe.
+TIPOS_POR_MANEJADOR = (
+    (CommandHandler, Update.MESSAGE),
+    (MessageHandler, Update.MESSAGE),
+    (CallbackQueryHandler, Update.CALLBACK_QUERY),
+    (InlineQueryHandler, Update.INLINE_QUERY),
+)
+
+
+def recorrer_manejadores(lista, incluir_timeout=True):
+    """
+    Recorre los manejadores de una lista, entrando en los de cada ConversationHandler.
+    Con `incluir_timeout=False` se omiten los del estado TIMEOUT, que los invoca la
+    conversación al vencer y no responden a ningún tipo de actualización.
+    """
+    for manejador in lista:
+        if isinstance(manejador, ConversationHandler):
+            yield from recorrer_manejadores(manejador.entry_points, incluir_timeout)
+            for estado, estados in manejador.states.items():
+                if incluir_timeout or estado != ConversationHandler.TIMEOUT:
+                    yield from recorrer_manejadores(estados, incluir_timeout)
+            yield from recorrer_manejadores(manejador.fallbacks, incluir_timeout)
+        else:
+            yield manejador
+
+
+def tipos_de_actualizacion(application):
+    """
+    Lista de `allowed_updates` con solo los tipos que atienden los manejadores
+    registrados. Si hay alguno desconocido, devuelve todos los tipos.
+    """
+    tipos = []
+    for grupo in sorted(application.handlers):
+        for manejador in recorrer_manejadores(application.handlers[grupo], incluir_timeout=False):
+            for clase, tipo in TIPOS_POR_MANEJADOR:
+                if isinstance(manejador, clase):
+                    break
+            else:
+                logger.warning("No se sabe qué actualizaciones atiende %s; se piden todas.", type(manejador).__name__)
+                return list(Update.ALL_TYPES)
+            if tipo not in tipos:
+                tipos.append(tipo)
+    return tipos
@@ -0,0 +1,180 @@
+"""
+Métricas del bot en formato de texto de Prometheus.
+
+Histogramas de latencia y contadores se actualizan en memoria (un bisect y dos
+sumas por observación), así que pueden quedar activos en producción. Los
+valores que ya existen en otro lado, como el tamaño del registro, se leen recién
+al pedir /metrics mediante funciones registradas con `medidor`.
+"""
+import functools
+import time
+from bisect import bisect_left
+
+from manejadores import recorrer_manejadores
+
+# Límites (en segundos) de los histogramas de latencia.
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Límites de los histogramas de cantidad de comparaciones por búsqueda.
+LIMITES_COMPARACIONES = (10, 100, 1000, 10_000, 100_000, 1_000_000)
+
+
+class Histograma:
+    __slots__ = ("limites", "cuentas", "suma", "total")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.cuentas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatear_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + "}"
+
+
+def _formatear_numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metricas:
+    def __init__(self):
+        self._descripciones = {}
+        self._histogramas = {}
+        self._contadores = {}
+        self._medidores = {}
+
+    def describir(self, nombre, tipo, ayuda):
+        self._descripciones[nombre] = (tipo, ayuda)
+
+    def observar(self, nombre, valor, limites=LIMITES_LATENCIA, **etiquetas):
+        clave = (nombre, tuple(etiquetas.items()))
+        histograma = self._histogramas.get(clave)
+        if histograma is None:
+            histograma = self._histogramas[clave] = Histograma(limites)
+        histograma.observar(valor)
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(etiquetas.items()))
+        self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def medidor(self, nombre, funcion, ayuda="", tipo="gauge"):
+        """
+        Registra un valor que se calcula al exportar. `funcion()` devuelve un número
+        o un diccionario {tupla de (etiqueta, valor): número}. Con tipo="counter" se
+        exportan contadores que otro objeto ya lleva.
+        """
+        self._medidores[nombre] = funcion
+        self.describir(nombre, tipo, ayuda)
+
+    def texto(self):
+        """Todas las métricas en el formato de exposición de texto de Prometheus."""
+        lineas = []
+        descritas = set()
+
+        def encabezado(nombre, tipo):
+            if nombre in descritas:
+                return
+            descritas.add(nombre)
+            tipo, ayuda = self._descripciones.get(nombre, (tipo, ""))
+            if ayuda:
+                lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+
+        for (nombre, etiquetas), valor in sorted(self._contadores.items()):
+            encabezado(nombre, "counter")
+            lineas.append(f"{nombre}{_formatear_etiquetas(etiquetas)} {_formatear_numero(valor)}")
+
+        for (nombre, etiquetas), histograma in sorted(self._histogramas.items(), key=lambda item: item[0]):
+            encabezado(nombre, "histogram")
+            acumulado = 0
+            for limite, cuenta in zip(histograma.limites + (float("inf"),), histograma.cuentas):
+                acumulado += cuenta
+                le = _formatear_etiquetas(etiquetas, (("le", _formatear_numero(limite)),))
+                lineas.append(f"{nombre}_bucket{le} {acumulado}")
+            lineas.append(f"{nombre}_sum{_formatear_etiquetas(etiquetas)} {_formatear_numero(histograma.suma)}")
+            lineas.append(f"{nombre}_count{_formatear_etiquetas(etiquetas)} {histograma.total}")
+
+        for nombre, funcion in self._medidores.items():
+            try:
+                valor = funcion()
+            except Exception:
+                continue
+            encabezado(nombre, "gauge")
+            if isinstance(valor, dict):
+                for etiquetas, numero in sorted(valor.items()):
+                    lineas.append(f"{nombre}{_formatear_etiquetas(etiquetas)} {_formatear_numero(numero)}")
+            else:
+                lineas.append(f"{nombre} {_formatear_numero(valor)}")
+
+        return "\n".join(lineas) + "\n"
+
+    async def manejar_http(self, metodo, ruta, encabezados, cuerpo):
+        """Manejador para ServidorHTTP: GET /metrics."""
+        if ruta != "/metrics":
+            return 404, "text/plain", b""
+        if metodo != "GET":
+            return 405, "text/plain", b""
+        return 200, "text/plain; version=0.0.4; charset=utf-8", self.texto().encode()
+
+    # --- Instrumentación ---
+
+    def medir_manejador(self, callback):
+        """Envuelve el callback de un manejador para medir su latencia y contar sus errores."""
+        nombre = callback.__name__
+
+        @functools.wraps(callback)
+        async def envoltura(update, context):
+            inicio = time.perf_counter()
+            try:
+                return await callback(update, context)
+            except Exception:
+                self.incrementar("bot_handler_errors_total", manejador=nombre)
+                raise
+            finally:
+                self.observar("bot_handler_duration_seconds", time.perf_counter() - inicio, manejador=nombre)
+
+        return envoltura
+
+    def instrumentar(self, application):
+        """
+        Mide todos los manejadores registrados en la Application, incluidos los
+        estados de las conversaciones y los de su vencimiento (TIMEOUT).
+        """
+        for grupo in application.handlers.values():
+            for manejador in recorrer_manejadores(grupo):
+                manejador.callback = self.medir_manejador(manejador.callback)
+
+    def registrar_llamada(self, endpoint, segundos, espera, error=None):
+        """Registra una llamada saliente a la API de Telegram (la usa PlanificadorEnvios)."""
+        self.observar("bot_api_request_duration_seconds", segundos, endpoint=endpoint)
+        self.observar("bot_api_rate_limit_wait_seconds", espera, endpoint=endpoint)
+        if error is not None:
+            self.incrementar("bot_api_errors_total", endpoint=endpoint, error=error)
+
+
+def crear_metricas():
+    metricas = Metricas()
+    metricas.describir("bot_handler_duration_seconds", "histogram", "Duración de cada manejador de actualizaciones.")
+    metricas.describir("bot_handler_errors_total", "counter", "Excepciones sin manejar por manejador.")
+    metricas.describir("bot_api_request_duration_seconds", "histogram", "Duración de las llamadas a la API de Telegram.")
+    metricas.describir("bot_api_rate_limit_wait_seconds", "histogram", "Espera en el limitador antes de cada llamada.")
+    metricas.describir("bot_api_errors_total", "counter", "Errores de las llamadas a la API de Telegram.")
+    metricas.describir("bot_search_total", "counter", "Búsquedas por tipo de coincidencia.")
+    metricas.describir("bot_search_comparisons", "histogram", "Alias puntuados por cada búsqueda aproximada.")
+    metricas.describir("bot_report_conversations_expired_total", "counter", "Reportes (/r) abandonados que se descartaron.")
+    metricas.describir("bot_evidence_photos_total", "counter", "Fotos de reportes, nuevas o ya publicadas en el canal.")
+    return metricas
@@ -0,0 +1,48 @@
+"""
+Normalización de usuarios de CAM4 y Telegram.
+
+Un mismo usuario llega escrito de muchas formas: "@Heladera40", "heladera40",
+"https://www.cam4.com/heladera40" o "t.me/Heladera40". `limpiar_usuario`
+extrae el nombre de usuario (quita el link y la @) para guardarlo, y
+`clave_alias` además pliega mayúsculas y acentos: es la clave con la que se
+indexan los alias, así esas variantes se reconocen como el mismo usuario con
+una búsqueda en un diccionario.
+"""
+import re
+import unicodedata
+from urllib.parse import unquote, urlsplit
+
+# Un texto que empieza con dominio y ruta ("cam4.com/usuario", "https://t.me/usuario").
+PATRON_URL = re.compile(r"^(?:[a-z][a-z0-9+.-]*://)?(?:[\w-]+\.)+[a-z]{2,}(?::\d+)?/", re.IGNORECASE)
+# Segmentos de ruta que preceden al usuario en algunos links de perfil.
+PREFIJOS_PERFIL = {"profile", "profiles", "perfil", "user", "users", "u", "s"}
+
+
+def es_url(texto):
+    return bool(PATRON_URL.match(texto))
+
+
+def limpiar_usuario(texto):
+    """Devuelve el nombre de usuario de `texto`: sin espacios alrededor, sin @ y, si es un link, solo el usuario."""
+    texto = texto.strip()
+    if es_url(texto):
+        partes = urlsplit(texto if "://" in texto else f"https://{texto}")
+        segmentos = [unquote(segmento) for segmento in partes.path.split("/") if segmento]
+        segmentos = [segmento for segmento in segmentos if segmento.lower() not in PREFIJOS_PERFIL]
+        if segmentos:
+            texto = segmentos[0]
+    return texto.lstrip("@").strip()
+
+
+def plegar(texto):
+    """Minúsculas y sin acentos ("Ibáñez" -> "ibanez")."""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(caracter for caracter in descompuesto if not unicodedata.combining(caracter)).casefold()
+
+
+def clave_alias(texto):
+    """Clave canónica de un usuario: limpio y plegado."""
+    # Caso más común (usuario ASCII sin link ni @): alcanza con pasar a minúsculas.
+    if texto.isascii() and "/" not in texto and "@" not in texto:
+        return texto.strip().lower()
+    return plegar(limpiar_usuario(texto))
@@ -0,0 +1,204 @@
+"""
+Persistencia de la lista de estafadores.
+
+Las escrituras se hacen de forma atómica (archivo temporal + fsync + rename) para
+que un corte a mitad de escritura nunca deje el JSON truncado, y se difieren
+fuera del event loop para que los handlers respondan sin esperar al disco.
+
+Cada alta o fusión se agrega como una línea a un diario (journal) en lugar de
+reescribir la lista completa; el diario se compacta en un nuevo snapshot cuando
+supera cierta cantidad de eventos.
+"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def escribir_json_atomico(ruta, datos):
+    """Serializa `datos` a JSON y reemplaza `ruta` de forma atómica."""
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    descriptor, ruta_temporal = tempfile.mkstemp(
+        prefix=f".{os.path.basename(ruta)}.", suffix=".tmp", dir=directorio
+    )
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ruta_temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(ruta_temporal)
+        except OSError:
+            pass
+        raise
+
+
+class GuardadoDiferido:
+    """
+    Guardado en segundo plano ("write-behind") con agrupación de cambios.
+
+    Cada mutación llama a `marcar()`, que solo levanta una bandera y agenda una
+    tarea. La tarea espera `demora` segundos, así una ráfaga de cambios termina
+    en una sola escritura, toma una copia de los datos en el event loop y hace la
+    serialización y la escritura en un hilo aparte.
+    """
+
+    def __init__(self, ruta, obtener_datos, demora=2.0):
+        self.ruta = ruta
+        self.obtener_datos = obtener_datos
+        self.demora = demora
+        self._pendiente = False
+        self._tarea = None
+        self._despertar = asyncio.Event()
+
+    @property
+    def pendiente(self):
+        return self._pendiente
+
+    def marcar(self):
+        """Marca los datos como modificados y agenda una escritura."""
+        self._pendiente = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sin event loop (scripts, pruebas manuales): se guarda en el momento.
+            self._guardar_sincrono()
+            return
+        if self._tarea is None or self._tarea.done():
+            self._tarea = loop.create_task(self._guardar_luego())
+
+    async def _guardar_luego(self):
+        try:
+            await asyncio.wait_for(self._despertar.wait(), timeout=self.demora)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await self._guardar_pendiente()
+        except Exception as e:
+            # El cambio sigue marcado como pendiente: se reintenta en la próxima escritura.
+            logger.error("Error al guardar %s: %s", self.ruta, e)
+
+    async def _guardar_pendiente(self):
+        while self._pendiente:
+            self._pendiente = False
+            datos = self.obtener_datos()
+            try:
+                await asyncio.to_thread(self._escribir, datos)
+            except Exception:
+                self._pendiente = True
+                raise
+
+    def _guardar_sincrono(self):
+        self._pendiente = False
+        self._escribir(self.obtener_datos())
+
+    def _escribir(self, datos):
+        escribir_json_atomico(self.ruta, datos)
+        logger.info("%s guardado.", self.ruta)
+
+    async def vaciar(self):
+        """Escribe de inmediato cualquier cambio pendiente. Se usa al apagar el bot."""
+        if self._tarea is not None and not self._tarea.done():
+            self._despertar.set()
+            await self._tarea
+        self._tarea = None
+        self._despertar.clear()
+        await self._guardar_pendiente()
+
+
+def leer_diario(ruta):
+    """
+    Lee los eventos del diario, uno por línea. Las líneas corruptas (por ejemplo,
+    la última si el proceso murió a mitad de escritura) se descartan.
+    """
+    eventos = []
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            for numero, linea in enumerate(f, 1):
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    eventos.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    logger.warning("Línea %s de %s inválida. Se descarta.", numero, ruta)
+    except FileNotFoundError:
+        pass
+    return eventos
+
+
+class DiarioMutaciones(GuardadoDiferido):
+    """
+    Diario de mutaciones de solo agregado, con compactación periódica.
+
+    `registrar(evento)` guarda el evento en memoria y agenda su escritura: los
+    eventos acumulados se agregan al diario en una sola escritura en segundo plano,
+    así cada alta cuesta unos pocos bytes en disco. Cuando el diario supera
+    `umbral_compactacion` eventos se escribe un snapshot completo (`ruta`) con los
+    datos actuales y el diario se vacía.
+    """
+
+    def __init__(self, ruta, ruta_diario, obtener_datos, umbral_compactacion=500, demora=1.0):
+        super().__init__(ruta, obtener_datos, demora=demora)
+        self.ruta_diario = ruta_diario
+        self.umbral_compactacion = umbral_compactacion
+        self.eventos_en_diario = 0
+        self._buffer = []
+
+    def registrar(self, evento):
+        """Agrega un evento al diario (la escritura se hace en segundo plano)."""
+        self._buffer.append(evento)
+        self.marcar()
+
+    def _guardar_sincrono(self):
+        self._pendiente = False
+        eventos, self._buffer = self._buffer, []
+        if self.eventos_en_diario + len(eventos) > self.umbral_compactacion:
+            self._compactar(self.obtener_datos())
+        else:
+            self._anexar(eventos)
+
+    async def _guardar_pendiente(self):
+        while self._pendiente:
+            self._pendiente = False
+            eventos, self._buffer = self._buffer, []
+            try:
+                if self.eventos_en_diario + len(eventos) > self.umbral_compactacion:
+                    # La copia se toma junto con el vaciado del buffer, así el snapshot
+                    # incluye exactamente los eventos que se descartan.
+                    await asyncio.to_thread(self._compactar, self.obtener_datos())
+                elif eventos:
+                    await asyncio.to_thread(self._anexar, eventos)
+            except Exception:
+                self._buffer = eventos + self._buffer
+                self._pendiente = True
+                raise
+
+    def _anexar(self, eventos):
+        with open(self.ruta_diario, "a", encoding="utf-8") as f:
+            for evento in eventos:
+                f.write(json.dumps(evento, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.eventos_en_diario += len(eventos)
+        logger.info("%s eventos agregados a %s.", len(eventos), self.ruta_diario)
+
+    def _compactar(self, datos):
+        escribir_json_atomico(self.ruta, datos)
+        # El snapshot ya contiene todo lo registrado: el diario puede vaciarse.
+        with open(self.ruta_diario, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.eventos_en_diario = 0
+        logger.info("Diario compactado en %s.", self.ruta)
+
+    def compactar(self):
+        """Compacta el diario de forma síncrona con los datos actuales."""
+        self._pendiente = False
+        self._buffer = []
+        self._compactar(self.obtener_datos())
@@ -0,0 +1,565 @@
+"""
+Prueba de carga de punta a punta contra una Bot API de Telegram falsa.
+
+Levanta en un puerto local un servidor que imita los métodos de la Bot API que
+usa el bot (getUpdates, sendMessage, sendPhoto, sendMediaGroup, ediciones,
+answerCallbackQuery, deleteMessages...), apunta el bot a él con URL_API_BOT y
+lo ejecuta completo: polling, procesamiento concurrente, planificador de envíos
+y persistencia, sobre una lista sintética (la de benchmark.py) en un directorio
+temporal. El servidor puede agregar latencia a cada llamada y responder 429
+("Too Many Requests") al azar, como Telegram bajo carga.
+
+Escenarios, en orden:
+
+- busquedas: muchos usuarios a la vez enviando /s.
+- reportes: usuarios completando /r con fotos, que se publican en ID_CANAL_FOTOS
+  (algunas fotos se repiten entre reportes, para ejercitar la evidencia repetida).
+- aprobaciones: el admin aprueba la mitad de los reportes con el botón
+  "Agregar a Estafadores" (todos los clics seguidos) y el resto con /aprobar todos.
+
+Cada usuario simulado espera la respuesta a un mensaje antes de enviar el
+siguiente. La latencia de punta a punta va desde que la actualización queda
+disponible en getUpdates hasta que el bot completa la llamada que la responde
+(el mensaje al usuario o, para los botones, la edición del reporte en el canal).
+Por escenario se informan actualizaciones por segundo, latencias p50/p90/p99 y
+las llamadas a la API por método; al final, las esperas del planificador.
+
+Los valores de config.py se pueden cambiar con --config (por ejemplo, para medir
+sin los límites de tasa de Telegram o con ACTUALIZACIONES_CONCURRENTES=1).
+
+Uso:
+    python prueba_carga.py --usuarios 50 --busquedas 10 --reportes 20 --salida carga.json
+    python prueba_carga.py --latencia 50 --tasa-429 0.02 --config TASA_GLOBAL=1000 TASA_CANAL=1000
+"""
+import argparse
+import ast
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict, deque
+from urllib.parse import parse_qsl
+
+from benchmark import _consultas, _percentil, _version, generar_estafadores
+from servidor_http import ServidorHTTP
+
+TOKEN_PRUEBA = "123456:prueba-de-carga"
+ID_ADMIN_PRUEBA = 1000
+ID_CANAL_PRUEBA = -1001000000001
+# Los usuarios simulados tienen IDs a partir de este número.
+PRIMER_USUARIO = 100_000
+# Métodos que no se demoran ni reciben 429: los usa el bot para arrancar y para recibir actualizaciones.
+METODOS_SIN_FALLAS = frozenset({"getMe", "getUpdates", "deleteWebhook", "setWebhook", "close", "logOut"})
+# Métodos cuya respuesta es un mensaje (o una lista de mensajes, sendMediaGroup).
+METODOS_DE_MENSAJE = frozenset({
+    "sendMessage", "sendPhoto", "sendDocument", "sendMediaGroup",
+    "editMessageText", "editMessageCaption", "editMessageReplyMarkup",
+})
+
+
+# --- Bot API falsa ---
+
+class BotAPIFalsa:
+    """
+    Servidor HTTP que responde como la Bot API a "/bot<token>/<método>".
+
+    Las actualizaciones encoladas con `encolar` se entregan por getUpdates (con
+    long polling y confirmación por offset, como Telegram). `esperar(clave)`
+    devuelve un future que se completa con el instante en que el bot responde:
+    la clave ("chat", chat_id) corresponde a un mensaje enviado a ese chat y
+    ("mensaje", message_id) a una edición o borrado de ese mensaje del canal.
+    """
+
+    def __init__(self, latencia=0.0, variacion=0.0, tasa_429=0.0, retry_after=1, semilla=0):
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_429 = tasa_429
+        self.retry_after = retry_after
+        self._azar = random.Random(semilla)
+        self.servidor = ServidorHTTP(self.atender, "127.0.0.1", 0)
+
+        self._actualizaciones = deque()
+        self._hay_actualizaciones = asyncio.Event()
+        self._ids_actualizacion = itertools.count(1)
+        self._ids_mensaje = itertools.count(1)
+        self._esperas = defaultdict(deque)
+
+        self.llamadas = Counter()
+        self.respuestas_429 = Counter()
+        self.en_curso = 0
+        # Caption de cada foto publicada en el canal con botones: {message_id: caption}.
+        self.reportes_publicados = {}
+
+    @property
+    def url_base(self):
+        return f"http://{self.servidor.host}:{self.servidor.puerto}/bot"
+
+    async def iniciar(self):
+        await self.servidor.iniciar()
+
+    async def detener(self):
+        await self.servidor.detener()
+
+    def encolar(self, actualizacion):
+        actualizacion["update_id"] = next(self._ids_actualizacion)
+        self._actualizaciones.append(actualizacion)
+        self._hay_actualizaciones.set()
+
+    def esperar(self, clave):
+        futuro = asyncio.get_running_loop().create_future()
+        self._esperas[clave].append(futuro)
+        return futuro
+
+    def _resolver(self, clave):
+        esperas = self._esperas.get(clave)
+        while esperas:
+            futuro = esperas.popleft()
+            if not futuro.done():
+                futuro.set_result(time.perf_counter())
+                return
+
+    # --- Solicitudes HTTP ---
+
+    async def atender(self, metodo_http, ruta, encabezados, cuerpo):
+        prefijo = f"/bot{TOKEN_PRUEBA}/"
+        if not ruta.startswith(prefijo):
+            return self._json(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+        metodo = ruta[len(prefijo):]
+        datos = _leer_parametros(encabezados.get("content-type", ""), cuerpo)
+        self.llamadas[metodo] += 1
+
+        if metodo == "getUpdates":
+            return self._json(200, {"ok": True, "result": await self._get_updates(datos)})
+        if metodo in METODOS_SIN_FALLAS:
+            return self._json(200, {"ok": True, "result": self._resultado(metodo, datos)})
+
+        self.en_curso += 1
+        try:
+            if self.latencia or self.variacion:
+                await asyncio.sleep(max(0.0, self.latencia + self._azar.uniform(-self.variacion, self.variacion)))
+            if self.tasa_429 and self._azar.random() < self.tasa_429:
+                self.respuestas_429[metodo] += 1
+                return self._json(429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                })
+            resultado = self._resultado(metodo, datos)
+            self._registrar_respuesta(metodo, datos)
+            return self._json(200, {"ok": True, "result": resultado})
+        finally:
+            self.en_curso -= 1
+
+    @staticmethod
+    def _json(estado, datos):
+        return estado, "application/json", json.dumps(datos, ensure_ascii=False).encode("utf-8")
+
+    async def _get_updates(self, datos):
+        offset = int(datos.get("offset") or 0)
+        limite = int(datos.get("limit") or 100)
+        espera = float(datos.get("timeout") or 0)
+        # Las actualizaciones con ID menor al offset ya fueron confirmadas.
+        while self._actualizaciones and self._actualizaciones[0]["update_id"] < offset:
+            self._actualizaciones.popleft()
+        if not self._actualizaciones and espera:
+            self._hay_actualizaciones.clear()
+            try:
+                await asyncio.wait_for(self._hay_actualizaciones.wait(), espera)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self._actualizaciones, limite))
+
+    def _registrar_respuesta(self, metodo, datos):
+        chat_id = datos.get("chat_id")
+        if metodo.startswith("send") and chat_id is not None:
+            self._resolver(("chat", chat_id))
+        elif metodo.startswith("editMessage") or metodo == "deleteMessage":
+            self._resolver(("mensaje", datos.get("message_id")))
+        elif metodo == "deleteMessages":
+            for message_id in datos.get("message_ids") or []:
+                self._resolver(("mensaje", message_id))
+
+    def _resultado(self, metodo, datos):
+        if metodo == "getMe":
+            return {
+                "id": int(TOKEN_PRUEBA.partition(":")[0]), "is_bot": True,
+                "first_name": "Bot de prueba", "username": "bot_prueba_carga",
+                "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": True,
+            }
+        if metodo not in METODOS_DE_MENSAJE:
+            return True
+        if metodo == "sendMediaGroup":
+            return [
+                self._mensaje(datos, next(self._ids_mensaje), {"photo": _tamanos_foto(medio.get("media"))})
+                for medio in datos.get("media") or []
+            ]
+        if metodo.startswith("editMessage"):
+            return self._mensaje(datos, datos.get("message_id"), {"caption": datos.get("caption", "")})
+
+        message_id = next(self._ids_mensaje)
+        contenido = {}
+        if metodo == "sendMessage":
+            contenido["text"] = datos.get("text", "")
+        elif metodo == "sendPhoto":
+            contenido["photo"] = _tamanos_foto(datos.get("photo"))
+            if datos.get("caption"):
+                contenido["caption"] = datos["caption"]
+                if datos.get("chat_id") == ID_CANAL_PRUEBA and datos.get("reply_markup"):
+                    self.reportes_publicados[message_id] = datos["caption"]
+        return self._mensaje(datos, message_id, contenido)
+
+    @staticmethod
+    def _mensaje(datos, message_id, contenido):
+        chat_id = datos.get("chat_id")
+        tipo = "channel" if isinstance(chat_id, int) and chat_id < 0 else "private"
+        return {"message_id": message_id, "date": int(time.time()), "chat": {"id": chat_id, "type": tipo}, **contenido}
+
+
+def _leer_parametros(tipo, cuerpo):
+    """
+    Parámetros de una llamada. python-telegram-bot los envía como formulario con
+    los valores que no son texto codificados en JSON (o como JSON, según la versión).
+    """
+    if not cuerpo:
+        return {}
+    if tipo.startswith("application/json"):
+        return json.loads(cuerpo)
+    datos = {}
+    for clave, valor in parse_qsl(cuerpo.decode("utf-8"), keep_blank_values=True):
+        try:
+            datos[clave] = json.loads(valor)
+        except ValueError:
+            datos[clave] = valor
+    return datos
+
+
+def _tamanos_foto(file_id):
+    file_id = str(file_id)
+    return [{"file_id": file_id, "file_unique_id": file_id.removeprefix("id_"), "width": 1280, "height": 960}]
+
+
+# --- Usuarios simulados ---
+
+def _usuario(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"Usuario {user_id}", "username": f"usuario{user_id}"}
+
+
+class Simulacion:
+    """Arma actualizaciones como las de Telegram y mide cuánto tarda el bot en responderlas."""
+
+    def __init__(self, api, timeout):
+        self.api = api
+        self.timeout = timeout
+        self._ids_mensaje = itertools.count(1)
+
+    def mensaje(self, user_id, texto=None, foto=None):
+        mensaje = {
+            "message_id": next(self._ids_mensaje),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": _usuario(user_id),
+        }
+        if texto is not None:
+            mensaje["text"] = texto
+            if texto.startswith("/"):
+                mensaje["entities"] = [{"type": "bot_command", "offset": 0, "length": len(texto.split()[0])}]
+        if foto is not None:
+            mensaje["photo"] = _tamanos_foto(f"id_{foto}")
+        return {"message": mensaje}
+
+    def clic(self, user_id, message_id, caption, datos):
+        return {"callback_query": {
+            "id": f"{user_id}-{message_id}-{next(self._ids_mensaje)}",
+            "from": _usuario(user_id),
+            "chat_instance": "prueba",
+            "data": datos,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": ID_CANAL_PRUEBA, "type": "channel"},
+                "caption": caption,
+                "photo": _tamanos_foto(f"id_reporte{message_id}"),
+            },
+        }}
+
+    async def enviar(self, actualizacion, clave, medicion):
+        """Encola la actualización y espera la respuesta del bot. Devuelve False si no llegó a tiempo."""
+        futuro = self.api.esperar(clave)
+        inicio = time.perf_counter()
+        self.api.encolar(actualizacion)
+        medicion.actualizaciones += 1
+        try:
+            fin = await asyncio.wait_for(futuro, self.timeout)
+        except asyncio.TimeoutError:
+            medicion.sin_respuesta += 1
+            return False
+        medicion.latencias.append(fin - inicio)
+        return True
+
+
+class Medicion:
+    """Resultados de un escenario."""
+
+    def __init__(self, api):
+        self.api = api
+        self.actualizaciones = 0
+        self.sin_respuesta = 0
+        self.latencias = []
+        self.extra = {}
+        self._llamadas = Counter(api.llamadas)
+        self._respuestas_429 = Counter(api.respuestas_429)
+        self._inicio = time.perf_counter()
+
+    def terminar(self):
+        duracion = time.perf_counter() - self._inicio
+        llamadas = self.api.llamadas - self._llamadas
+        del llamadas["getUpdates"]
+        return {
+            "actualizaciones": self.actualizaciones,
+            "sin_respuesta": self.sin_respuesta,
+            "duracion_s": round(duracion, 3),
+            "actualizaciones_por_s": round(self.actualizaciones / duracion, 2) if duracion else 0.0,
+            "latencia": _resumen(self.latencias),
+            "llamadas": dict(sorted(llamadas.items())),
+            "llamadas_total": sum(llamadas.values()),
+            "respuestas_429": sum((self.api.respuestas_429 - self._respuestas_429).values()),
+            **self.extra,
+        }
+
+
+def _resumen(tiempos):
+    return {
+        "n": len(tiempos),
+        "p50_ms": round(_percentil(tiempos, 50) * 1000, 2),
+        "p90_ms": round(_percentil(tiempos, 90) * 1000, 2),
+        "p99_ms": round(_percentil(tiempos, 99) * 1000, 2),
+        "max_ms": round(max(tiempos, default=0.0) * 1000, 2),
+    }
+
+
+# --- Escenarios ---
+
+async def escenario_busquedas(sim, usuarios, busquedas, consultas):
+    medicion = Medicion(sim.api)
+
+    async def usuario(numero):
+        user_id = PRIMER_USUARIO + numero
+        for i in range(busquedas):
+            consulta = " ".join(consultas[(numero * busquedas + i) % len(consultas)])
+            await sim.enviar(sim.mensaje(user_id, f"/s {consulta}"), ("chat", user_id), medicion)
+
+    await asyncio.gather(*(usuario(numero) for numero in range(usuarios)))
+    return medicion
+
+
+async def escenario_reportes(sim, reportes, fotos, estafadores):
+    """
+    Cada reporte lo completa un usuario distinto: /r, los tres textos, las fotos
+    y /finalizar_fotos. Una de cada cuatro fotos adicionales es de un grupo
+    compartido entre reportes.
+    """
+    medicion = Medicion(sim.api)
+    duraciones = []
+
+    async def reportar(numero):
+        user_id = PRIMER_USUARIO + 1_000_000 + numero
+        clave = ("chat", user_id)
+        estafador = estafadores[numero % len(estafadores)]
+        inicio = time.perf_counter()
+        pasos = [
+            sim.mensaje(user_id, "/r"),
+            sim.mensaje(user_id, f"https://www.cam4.com/{estafador['cam4_users'][0]}carga{numero}"),
+            sim.mensaje(user_id, f"@{estafador['telegram_users'][0]}carga{numero}"),
+            sim.mensaje(user_id, estafador["nombre"]),
+        ]
+        for i in range(fotos):
+            foto = f"compartida{i}" if i and (numero + i) % 4 == 0 else f"reporte{numero}foto{i}"
+            pasos.append(sim.mensaje(user_id, foto=foto))
+        pasos.append(sim.mensaje(user_id, "/finalizar_fotos"))
+        for paso in pasos:
+            if not await sim.enviar(paso, clave, medicion):
+                return
+        duraciones.append(time.perf_counter() - inicio)
+
+    await asyncio.gather(*(reportar(numero) for numero in range(reportes)))
+    medicion.extra["reporte_completo"] = _resumen(duraciones)
+    return medicion
+
+
+async def escenario_aprobaciones(sim):
+    """
+    El admin aprueba con el botón la mitad de los reportes publicados, con todos
+    los clics seguidos (se atienden de a uno, en orden), y el resto con /aprobar todos.
+    """
+    medicion = Medicion(sim.api)
+    publicados = sorted(sim.api.reportes_publicados.items())
+    con_boton = publicados[:len(publicados) // 2]
+
+    await asyncio.gather(*(
+        sim.enviar(
+            sim.clic(ID_ADMIN_PRUEBA, message_id, caption, f"add_scammer_{message_id}"),
+            ("mensaje", message_id),
+            medicion,
+        )
+        for message_id, caption in con_boton
+    ))
+    if len(publicados) > len(con_boton):
+        await sim.enviar(sim.mensaje(ID_ADMIN_PRUEBA, "/aprobar todos"), ("chat", ID_ADMIN_PRUEBA), medicion)
+    medicion.extra["aprobados_con_boton"] = len(con_boton)
+    medicion.extra["aprobados_en_lote"] = len(publicados) - len(con_boton)
+    return medicion
+
+
+async def _esperar_envios(bot, api, quietud=0.3, maximo=120):
+    """
+    Espera a que terminen los envíos en segundo plano (fotos adicionales, ediciones
+    en lote): nada en la cola del planificador ni en curso durante `quietud` segundos.
+    """
+    limite = time.monotonic() + maximo
+    tranquilo_desde = None
+    while time.monotonic() < limite:
+        en_cola = sum(datos["en_cola"] for datos in bot.planificador_envios.metricas()["prioridades"].values())
+        if en_cola or api.en_curso:
+            tranquilo_desde = None
+        elif tranquilo_desde is None:
+            tranquilo_desde = time.monotonic()
+        elif time.monotonic() - tranquilo_desde >= quietud:
+            return
+        await asyncio.sleep(0.05)
+    print("Quedaron envíos pendientes al pasar al siguiente escenario.", file=sys.stderr)
+
+
+# --- Ejecución ---
+
+def _valor_config(texto):
+    clave, separador, valor = texto.partition("=")
+    if not separador or not clave.isidentifier():
+        raise argparse.ArgumentTypeError(f"se esperaba CLAVE=VALOR: {texto}")
+    try:
+        return clave, ast.literal_eval(valor)
+    except (ValueError, SyntaxError):
+        return clave, valor
+
+
+async def ejecutar(args):
+    api = BotAPIFalsa(args.latencia / 1000, args.variacion / 1000, args.tasa_429, args.retry_after)
+    await api.iniciar()
+
+    # El bot lee config al importarse: se ajusta antes para que use la API falsa y los IDs de prueba.
+    import config
+    config.TOKEN_BOT = TOKEN_PRUEBA
+    config.ID_ADMIN = ID_ADMIN_PRUEBA
+    config.ID_CANAL_FOTOS = ID_CANAL_PRUEBA
+    config.URL_API_BOT = api.url_base
+    config.PUERTO_METRICAS = None
+    for clave, valor in args.config:
+        setattr(config, clave, valor)
+    import bot
+    logging.getLogger().setLevel(logging.WARNING)
+
+    estafadores = generar_estafadores(args.alias)
+    with open(bot.ARCHIVO_ESTAFADORES, "w", encoding="utf-8") as f:
+        json.dump(estafadores, f, ensure_ascii=False, indent=4)
+    consultas = _consultas(estafadores, max(1, args.usuarios * args.busquedas))
+
+    bot.abrir_datos()
+    application = bot.crear_aplicacion()
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    await application.updater.start_polling(
+        poll_interval=0, timeout=10, allowed_updates=bot.tipos_de_actualizacion(application)
+    )
+
+    sim = Simulacion(api, args.timeout)
+    resultados = {}
+    try:
+        escenarios = [
+            ("busquedas", lambda: escenario_busquedas(sim, args.usuarios, args.busquedas, consultas)),
+            ("reportes", lambda: escenario_reportes(sim, args.reportes, args.fotos, estafadores)),
+            ("aprobaciones", lambda: escenario_aprobaciones(sim)),
+        ]
+        for nombre, escenario in escenarios:
+            print(f"Escenario {nombre}...", file=sys.stderr)
+            medicion = await escenario()
+            await _esperar_envios(bot, api)
+            resultados[nombre] = medicion.terminar()
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await api.detener()
+
+    planificador = bot.planificador_envios.metricas()
+    resultados["planificador"] = {
+        "reintentos": planificador["reintentos"],
+        "espera_media_ms": {
+            prioridad: round(datos["espera_media"] * 1000, 2) for prioridad, datos in planificador["prioridades"].items()
+        },
+        "espera_maxima_ms": {
+            prioridad: round(datos["espera_maxima"] * 1000, 2) for prioridad, datos in planificador["prioridades"].items()
+        },
+    }
+    resultados["llamadas_total"] = dict(sorted(api.llamadas.items()))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alias", type=int, default=10_000, help="Tamaño de la lista sintética, en alias.")
+    parser.add_argument("--usuarios", type=int, default=50, help="Usuarios buscando con /s a la vez.")
+    parser.add_argument("--busquedas", type=int, default=10, help="Búsquedas por usuario.")
+    parser.add_argument("--reportes", type=int, default=20, help="Reportes /r enviados a la vez.")
+    parser.add_argument("--fotos", type=int, default=3, help="Fotos por reporte.")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Latencia de cada llamada a la API falsa, en ms.")
+    parser.add_argument("--variacion", type=float, default=0.0, help="Variación al azar de la latencia (+/- ms).")
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Fracción de llamadas que reciben 429.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Segundos de retry_after en las respuestas 429.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Segundos de espera por cada respuesta.")
+    parser.add_argument(
+        "--config", type=_valor_config, nargs="*", default=[], metavar="CLAVE=VALOR",
+        help="Valores de config.py a reemplazar (por ejemplo TASA_GLOBAL=1000).",
+    )
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    salida = os.path.abspath(args.salida) if args.salida else None
+    directorio_repo = os.path.dirname(os.path.abspath(__file__))
+    directorio = tempfile.mkdtemp(prefix="prueba_carga_")
+    sys.path.insert(0, directorio_repo)
+    directorio_original = os.getcwd()
+    os.chdir(directorio)
+    try:
+        resultados = asyncio.run(ejecutar(args))
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    informe = {
+        "version": _version(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {clave: valor for clave, valor in vars(args).items() if clave != "salida"},
+        "resultados": resultados,
+    }
+    print(json.dumps(resultados, ensure_ascii=False, indent=4))
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, ensure_ascii=False, indent=4)
+        print(f"Resultados guardados en {salida}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
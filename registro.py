@@ -0,0 +1,216 @@
+"""
+Lista de estafadores en memoria con índices por nombre y por usuario.
+
+Reemplaza la lista de diccionarios recorrida linealmente: cada estafador es un
+registro compacto y la lista mantiene diccionarios desde el nombre (en
+minúsculas) y desde la clave canónica de cada alias (ver normalizacion.py)
+hacia sus registros, así las fusiones y las búsquedas exactas no dependen del
+tamaño de la lista.
+"""
+import logging
+
+from normalizacion import clave_alias, limpiar_usuario
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_ALIAS = ("cam4_users", "telegram_users")
+
+
+class Estafador:
+    """
+    Registro de un estafador. Los usuarios se guardan en orden de alta y sus
+    claves canónicas en un set, así "@Pepito" y "pepito" cuentan como el mismo usuario.
+    """
+
+    __slots__ = ("nombre", "cam4_users", "telegram_users", "_cam4_set", "_telegram_set", "id")
+
+    def __init__(self, nombre, cam4_users=(), telegram_users=(), id=None):
+        self.nombre = nombre
+        self.cam4_users = []
+        self.telegram_users = []
+        self._cam4_set = set()
+        self._telegram_set = set()
+        self.id = id
+        for usuario in cam4_users:
+            self.agregar_alias("cam4_users", usuario)
+        for usuario in telegram_users:
+            self.agregar_alias("telegram_users", usuario)
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(
+            datos.get("nombre", ""),
+            datos.get("cam4_users", []),
+            datos.get("telegram_users", []),
+        )
+
+    @classmethod
+    def precalculado(cls, nombre, cam4_users, cam4_claves, telegram_users, telegram_claves):
+        """Registro armado con las claves canónicas ya calculadas (ver instantanea.py)."""
+        estafador = cls.__new__(cls)
+        estafador.nombre = nombre
+        estafador.cam4_users = cam4_users
+        estafador.telegram_users = telegram_users
+        estafador._cam4_set = set(cam4_claves)
+        estafador._telegram_set = set(telegram_claves)
+        estafador.id = None
+        return estafador
+
+    def a_dict(self):
+        """Devuelve el registro con el formato de estafadores.json (listas nuevas, no compartidas)."""
+        return {
+            "nombre": self.nombre,
+            "cam4_users": list(self.cam4_users),
+            "telegram_users": list(self.telegram_users),
+        }
+
+    def alias(self, campo):
+        return self.cam4_users if campo == "cam4_users" else self.telegram_users
+
+    def tiene_alias(self, campo, usuario):
+        conjunto = self._cam4_set if campo == "cam4_users" else self._telegram_set
+        return clave_alias(usuario) in conjunto
+
+    def agregar_alias(self, campo, usuario):
+        """Agrega un usuario si no estaba (comparando claves canónicas). Devuelve True si se agregó."""
+        conjunto = self._cam4_set if campo == "cam4_users" else self._telegram_set
+        clave = clave_alias(usuario) if usuario else ""
+        if not clave or clave in conjunto:
+            return False
+        conjunto.add(clave)
+        self.alias(campo).append(usuario)
+        return True
+
+
+class RegistroMemoria:
+    """
+    Lista de estafadores en memoria.
+
+    `fusionar` aplica la regla de siempre (mismo nombre sin distinguir mayúsculas
+    = misma persona, se suman los usuarios que falten) en O(1) gracias a los
+    índices. Expone la misma interfaz que RegistroSQLite.
+    """
+
+    def __init__(self):
+        # Se incrementa con cada cambio; permite saber si algo calculado a partir
+        # de la lista (páginas, resultados en caché) quedó viejo.
+        self.generacion = 0
+        self.estafadores = []
+        self._por_nombre = {}
+        self._por_alias = {campo: {} for campo in CAMPOS_ALIAS}
+
+    def __len__(self):
+        return len(self.estafadores)
+
+    def __iter__(self):
+        return iter(self.estafadores)
+
+    def iterar(self):
+        return iter(self.estafadores)
+
+    def cargar(self, lista):
+        """Reemplaza el contenido por una lista en formato JSON."""
+        self.estafadores = []
+        self._por_nombre = {}
+        self._por_alias = {campo: {} for campo in CAMPOS_ALIAS}
+        for datos in lista:
+            self._agregar_registro(Estafador.desde_dict(datos))
+        self.generacion += 1
+
+    def cargar_precalculado(self, registros):
+        """
+        Como `cargar`, pero a partir de tuplas (nombre, usuarios_cam4, claves_cam4,
+        usuarios_telegram, claves_telegram) con las claves canónicas ya calculadas.
+        """
+        self.estafadores = []
+        self._por_nombre = {}
+        self._por_alias = {campo: {} for campo in CAMPOS_ALIAS}
+        por_cam4 = self._por_alias["cam4_users"]
+        por_telegram = self._por_alias["telegram_users"]
+        for nombre, cam4_users, cam4_claves, telegram_users, telegram_claves in registros:
+            estafador = Estafador.precalculado(nombre, cam4_users, cam4_claves, telegram_users, telegram_claves)
+            self.estafadores.append(estafador)
+            self._por_nombre.setdefault(nombre.lower(), estafador)
+            for clave in cam4_claves:
+                por_cam4.setdefault(clave, []).append(estafador)
+            for clave in telegram_claves:
+                por_telegram.setdefault(clave, []).append(estafador)
+        self.generacion += 1
+
+    def _agregar_registro(self, estafador):
+        self.estafadores.append(estafador)
+        # Si hay nombres repetidos, las fusiones van al primero (como la búsqueda lineal de antes).
+        self._por_nombre.setdefault(estafador.nombre.lower(), estafador)
+        for campo in CAMPOS_ALIAS:
+            for usuario in estafador.alias(campo):
+                self._indexar_alias(campo, usuario, estafador)
+
+    def a_lista(self):
+        """Copia de la lista en formato JSON, segura para serializar fuera del event loop."""
+        return [estafador.a_dict() for estafador in self.estafadores]
+
+    def referencia(self, estafador):
+        return estafador
+
+    def obtener(self, referencia):
+        return referencia
+
+    def _indexar_alias(self, campo, usuario, estafador):
+        self._por_alias[campo].setdefault(clave_alias(usuario), []).append(estafador)
+
+    def buscar_por_nombre(self, nombre):
+        """Busca una persona por nombre sin distinguir mayúsculas."""
+        return self._por_nombre.get(nombre.lower())
+
+    def buscar_por_alias(self, campo, usuario):
+        """Devuelve las personas que tienen `usuario` (comparando claves canónicas) en `campo`."""
+        return list(self._por_alias[campo].get(clave_alias(usuario), []))
+
+    def buscar_exacto(self, texto):
+        """
+        Personas cuyo nombre (sin distinguir mayúsculas) o algún usuario (por clave
+        canónica, así también sirve un link o una @) coincide exactamente con `texto`.
+        """
+        encontrados = []
+        estafador = self._por_nombre.get(texto.lower())
+        if estafador is not None:
+            encontrados.append(estafador)
+        clave = clave_alias(texto)
+        for campo in CAMPOS_ALIAS:
+            for estafador in self._por_alias[campo].get(clave, []):
+                if estafador not in encontrados:
+                    encontrados.append(estafador)
+        return encontrados
+
+    def fusionar(self, nombre, user_cam4, user_telegram):
+        """
+        Agrega un estafador o le suma los usuarios que todavía no tenga. Los
+        usuarios se guardan limpios (sin @ y sin link, ver normalizacion.py).
+        Devuelve (estafador, es_nuevo, agregados), donde `agregados` es una lista
+        de tuplas (campo, usuario) con los alias nuevos.
+        """
+        estafador = self._por_nombre.get(nombre.lower())
+        es_nuevo = estafador is None
+        if es_nuevo:
+            estafador = Estafador(nombre)
+            self._agregar_registro(estafador)
+
+        agregados = []
+        for campo, usuario in (("cam4_users", user_cam4), ("telegram_users", user_telegram)):
+            usuario = limpiar_usuario(usuario) if usuario else usuario
+            if estafador.agregar_alias(campo, usuario):
+                self._indexar_alias(campo, usuario, estafador)
+                agregados.append((campo, usuario))
+        if es_nuevo or agregados:
+            self.generacion += 1
+        return estafador, es_nuevo, agregados
+
+    def fusionar_lote(self, filas):
+        """Aplica `fusionar` a cada tupla (nombre, user_cam4, user_telegram). Devuelve los resultados en orden."""
+        return [self.fusionar(nombre, user_cam4, user_telegram) for nombre, user_cam4, user_telegram in filas]
+
+    def valores_ordenados(self, campo):
+        """Valores únicos y ordenados de "nombre", "cam4_users" o "telegram_users"."""
+        if campo == "nombre":
+            return sorted(set(e.nombre for e in self.estafadores if e.nombre))
+        return sorted(set(usuario for e in self.estafadores for usuario in e.alias(campo)))
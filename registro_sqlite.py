@@ -0,0 +1,257 @@
+"""
+Almacenamiento opcional de la lista de estafadores en SQLite.
+
+Personas, usuarios de CAM4 y usuarios de Telegram viven en tablas separadas con
+índices sobre las claves (nombre en minúsculas, clave canónica de cada usuario),
+de modo que las búsquedas exactas, las fusiones y el orden de /list salen de
+índices en lugar de recorrer la lista.
+"""
+import logging
+import sqlite3
+
+from normalizacion import clave_alias, limpiar_usuario
+from registro import Estafador
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS personas (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    nombre_clave TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_personas_nombre ON personas (nombre);
+
+CREATE TABLE IF NOT EXISTS alias_cam4 (
+    persona_id INTEGER NOT NULL REFERENCES personas (id),
+    usuario TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    UNIQUE (persona_id, usuario)
+);
+CREATE INDEX IF NOT EXISTS idx_alias_cam4_clave ON alias_cam4 (clave);
+CREATE INDEX IF NOT EXISTS idx_alias_cam4_usuario ON alias_cam4 (usuario);
+
+CREATE TABLE IF NOT EXISTS alias_telegram (
+    persona_id INTEGER NOT NULL REFERENCES personas (id),
+    usuario TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    UNIQUE (persona_id, usuario)
+);
+CREATE INDEX IF NOT EXISTS idx_alias_telegram_clave ON alias_telegram (clave);
+CREATE INDEX IF NOT EXISTS idx_alias_telegram_usuario ON alias_telegram (usuario);
+"""
+
+# Versión del esquema (PRAGMA user_version). 1: la columna `clave` guarda la clave canónica del usuario.
+# 2: la columna `usuario` guarda el usuario limpio (sin @ ni link), como lo deja `fusionar`.
+VERSION_ESQUEMA = 2
+
+# Tabla de alias para cada campo del registro en formato JSON.
+TABLAS_ALIAS = {
+    "cam4_users": "alias_cam4",
+    "telegram_users": "alias_telegram",
+}
+
+
+class RegistroSQLite:
+    """
+    Lista de estafadores respaldada por SQLite (modo WAL).
+
+    Los registros se devuelven como objetos Estafador con su `id`, y la clase
+    expone la misma interfaz que RegistroMemoria, así el resto del bot no
+    distingue de qué almacenamiento vienen.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute("PRAGMA foreign_keys=ON")
+        self.conexion.executescript(ESQUEMA)
+        self.conexion.commit()
+        version = self.conexion.execute("PRAGMA user_version").fetchone()[0]
+        if version < VERSION_ESQUEMA:
+            self._migrar()
+        # Se incrementa con cada cambio hecho desde este proceso (ver RegistroMemoria).
+        self.generacion = 0
+
+    def _migrar(self):
+        """
+        Limpia los usuarios guardados por versiones anteriores (con @ o como link)
+        y recalcula sus claves. Si al limpiarlos una persona queda con dos usuarios
+        iguales, se conserva el primero, igual que al fusionar.
+        """
+        with self.conexion:
+            for tabla in TABLAS_ALIAS.values():
+                filas = self.conexion.execute(
+                    f"SELECT rowid, persona_id, usuario FROM {tabla} ORDER BY rowid"
+                ).fetchall()
+                vistos = set()
+                cambios = []
+                borrados = []
+                for rowid, persona_id, usuario in filas:
+                    limpio = limpiar_usuario(usuario)
+                    clave = clave_alias(limpio)
+                    if not limpio or (persona_id, clave) in vistos:
+                        borrados.append((rowid,))
+                        continue
+                    vistos.add((persona_id, clave))
+                    cambios.append((limpio, clave, rowid))
+                self.conexion.executemany(f"DELETE FROM {tabla} WHERE rowid = ?", borrados)
+                self.conexion.executemany(f"UPDATE {tabla} SET usuario = ?, clave = ? WHERE rowid = ?", cambios)
+            self.conexion.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+        logger.info("Base %s actualizada a la versión %s del esquema.", self.ruta, VERSION_ESQUEMA)
+
+    def __len__(self):
+        return self.conexion.execute("SELECT COUNT(*) FROM personas").fetchone()[0]
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def referencia(self, estafador):
+        return estafador.id
+
+    def _alias(self, tabla, persona_id):
+        filas = self.conexion.execute(
+            f"SELECT usuario FROM {tabla} WHERE persona_id = ? ORDER BY rowid", (persona_id,)
+        )
+        return [fila[0] for fila in filas]
+
+    def obtener(self, persona_id):
+        """Devuelve el registro completo de una persona, o None si no existe."""
+        fila = self.conexion.execute("SELECT id, nombre FROM personas WHERE id = ?", (persona_id,)).fetchone()
+        if fila is None:
+            return None
+        return Estafador(
+            fila[1],
+            self._alias("alias_cam4", fila[0]),
+            self._alias("alias_telegram", fila[0]),
+            id=fila[0],
+        )
+
+    def buscar_por_nombre(self, nombre):
+        """Busca una persona por nombre sin distinguir mayúsculas."""
+        fila = self.conexion.execute(
+            "SELECT id FROM personas WHERE nombre_clave = ?", (nombre.lower(),)
+        ).fetchone()
+        return self.obtener(fila[0]) if fila else None
+
+    def buscar_por_alias(self, campo, usuario):
+        """Devuelve las personas que tienen `usuario` (comparando claves canónicas) en `campo`."""
+        tabla = TABLAS_ALIAS[campo]
+        filas = self.conexion.execute(
+            f"SELECT DISTINCT persona_id FROM {tabla} WHERE clave = ?", (clave_alias(usuario),)
+        )
+        return [self.obtener(fila[0]) for fila in filas.fetchall()]
+
+    def buscar_exacto(self, texto):
+        """
+        Personas cuyo nombre (sin distinguir mayúsculas) o algún usuario (por clave
+        canónica) coincide exactamente con `texto`.
+        """
+        clave = clave_alias(texto)
+        filas = self.conexion.execute(
+            """
+            SELECT id FROM personas WHERE nombre_clave = ?
+            UNION SELECT persona_id FROM alias_cam4 WHERE clave = ?
+            UNION SELECT persona_id FROM alias_telegram WHERE clave = ?
+            """,
+            (texto.lower(), clave, clave),
+        ).fetchall()
+        return [self.obtener(fila[0]) for fila in filas]
+
+    def iterar(self):
+        """Recorre todos los registros sin cargarlos todos juntos en memoria."""
+        for (persona_id,) in self.conexion.execute("SELECT id FROM personas ORDER BY id").fetchall():
+            yield self.obtener(persona_id)
+
+    def _fusionar(self, nombre, user_cam4, user_telegram):
+        fila = self.conexion.execute(
+            "SELECT id FROM personas WHERE nombre_clave = ?", (nombre.lower(),)
+        ).fetchone()
+        es_nuevo = fila is None
+        if es_nuevo:
+            persona_id = self.conexion.execute(
+                "INSERT INTO personas (nombre, nombre_clave) VALUES (?, ?)", (nombre, nombre.lower())
+            ).lastrowid
+        else:
+            persona_id = fila[0]
+
+        agregados = []
+        for campo, usuario in (("cam4_users", user_cam4), ("telegram_users", user_telegram)):
+            usuario = limpiar_usuario(usuario) if usuario else ""
+            if not usuario:
+                continue
+            tabla = TABLAS_ALIAS[campo]
+            clave = clave_alias(usuario)
+            existe = self.conexion.execute(
+                f"SELECT 1 FROM {tabla} WHERE persona_id = ? AND clave = ?", (persona_id, clave)
+            ).fetchone()
+            if existe:
+                continue
+            self.conexion.execute(
+                f"INSERT INTO {tabla} (persona_id, usuario, clave) VALUES (?, ?, ?)",
+                (persona_id, usuario, clave),
+            )
+            agregados.append((campo, usuario))
+        return persona_id, es_nuevo, agregados
+
+    def fusionar(self, nombre, user_cam4, user_telegram):
+        """
+        Aplica la misma regla de fusión que la lista en memoria y confirma la
+        transacción. Devuelve (estafador, es_nuevo, agregados), donde `agregados`
+        es una lista de tuplas (campo, usuario) con los alias nuevos.
+        """
+        with self.conexion:
+            persona_id, es_nuevo, agregados = self._fusionar(nombre, user_cam4, user_telegram)
+        if es_nuevo or agregados:
+            self.generacion += 1
+        return self.obtener(persona_id), es_nuevo, agregados
+
+    def fusionar_lote(self, filas):
+        """
+        Aplica la regla de fusión a cada tupla (nombre, user_cam4, user_telegram)
+        en una sola transacción. Devuelve los resultados en orden, con los
+        registros leídos al final del lote.
+        """
+        resultados = []
+        with self.conexion:
+            for nombre, user_cam4, user_telegram in filas:
+                resultados.append(self._fusionar(nombre, user_cam4, user_telegram))
+        if any(es_nuevo or agregados for _, es_nuevo, agregados in resultados):
+            self.generacion += 1
+        registros = {}
+        for persona_id, _, _ in resultados:
+            if persona_id not in registros:
+                registros[persona_id] = self.obtener(persona_id)
+        return [(registros[persona_id], es_nuevo, agregados) for persona_id, es_nuevo, agregados in resultados]
+
+    def importar(self, estafadores):
+        """
+        Importa una lista de registros Estafador en una sola transacción. Los
+        usuarios pasan por la misma limpieza que en `fusionar`.
+        """
+        cantidad = 0
+        with self.conexion:
+            for estafador in estafadores:
+                cantidad += 1
+                nombre = estafador.nombre
+                self._fusionar(nombre, "", "")
+                for user_cam4 in estafador.cam4_users:
+                    self._fusionar(nombre, user_cam4, "")
+                for user_telegram in estafador.telegram_users:
+                    self._fusionar(nombre, "", user_telegram)
+        self.generacion += 1
+        logger.info("Importados %s estafadores a %s.", cantidad, self.ruta)
+
+    def a_lista(self):
+        """Toda la lista en formato JSON."""
+        return [estafador.a_dict() for estafador in self.iterar()]
+
+    def valores_ordenados(self, campo):
+        """Valores únicos y ordenados de "nombre", "cam4_users" o "telegram_users", usando los índices."""
+        if campo == "nombre":
+            consulta = "SELECT DISTINCT nombre FROM personas WHERE nombre != '' ORDER BY nombre"
+        else:
+            consulta = f"SELECT DISTINCT usuario FROM {TABLAS_ALIAS[campo]} ORDER BY usuario"
+        return [fila[0] for fila in self.conexion.execute(consulta)]
@@ -0,0 +1,155 @@
+"""
+Almacén de reportes pendientes de revisión.
+
+Guarda los datos de cada reporte enviado al canal (clave: message_id de la
+primera foto) en una base SQLite pequeña, así sobreviven a un reinicio del bot.
+Los reportes vencen después de `ttl` segundos y, si se supera `maximo`, se
+descartan los más viejos, de modo que el almacén no crece sin límite.
+"""
+import json
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS reportes_pendientes (
+    report_id TEXT PRIMARY KEY,
+    datos TEXT NOT NULL,
+    creado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reportes_pendientes_creado ON reportes_pendientes (creado);
+"""
+# Claves por consulta con IN (...), por debajo del límite de parámetros de SQLite.
+TAMANO_LOTE = 500
+
+
+def _lotes(claves):
+    claves = list(claves)
+    for inicio in range(0, len(claves), TAMANO_LOTE):
+        yield claves[inicio:inicio + TAMANO_LOTE]
+
+
+class ReportesPendientes:
+    """
+    Almacén con interfaz de diccionario (`in`, `[]`, `del`, `len`) respaldado por SQLite.
+
+    Las consultas van por clave primaria y no se mantiene ninguna copia en memoria;
+    solo se lleva la cuenta de reportes guardados (vigentes o no) para aplicar el
+    máximo sin recorrer la tabla. `len` cuenta solo los vigentes, con el índice por fecha.
+    """
+
+    def __init__(self, ruta, ttl=7 * 24 * 3600, maximo=10000):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.maximo = maximo
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(ESQUEMA)
+        self.conexion.commit()
+        self._cantidad = self.conexion.execute("SELECT COUNT(*) FROM reportes_pendientes").fetchone()[0]
+        self.purgar()
+
+    def _limite_vigencia(self):
+        return time.time() - self.ttl
+
+    def __len__(self):
+        """Reportes vigentes: los vencidos que todavía no se purgaron no cuentan, igual que en las lecturas."""
+        return self.conexion.execute(
+            "SELECT COUNT(*) FROM reportes_pendientes WHERE creado >= ?", (self._limite_vigencia(),)
+        ).fetchone()[0]
+
+    def __contains__(self, report_id):
+        return self.get(report_id) is not None
+
+    def get(self, report_id, default=None):
+        fila = self.conexion.execute(
+            "SELECT datos FROM reportes_pendientes WHERE report_id = ? AND creado >= ?",
+            (report_id, self._limite_vigencia()),
+        ).fetchone()
+        return json.loads(fila[0]) if fila else default
+
+    def __getitem__(self, report_id):
+        datos = self.get(report_id)
+        if datos is None:
+            raise KeyError(report_id)
+        return datos
+
+    def __setitem__(self, report_id, datos):
+        existe = self.conexion.execute(
+            "SELECT 1 FROM reportes_pendientes WHERE report_id = ?", (report_id,)
+        ).fetchone()
+        with self.conexion:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO reportes_pendientes (report_id, datos, creado) VALUES (?, ?, ?)",
+                (report_id, json.dumps(datos, ensure_ascii=False), time.time()),
+            )
+        if not existe:
+            self._cantidad += 1
+        self.purgar()
+
+    def __delitem__(self, report_id):
+        with self.conexion:
+            cursor = self.conexion.execute("DELETE FROM reportes_pendientes WHERE report_id = ?", (report_id,))
+        if not cursor.rowcount:
+            raise KeyError(report_id)
+        self._cantidad -= 1
+
+    def items(self, limite=None):
+        """Reportes vigentes, del más viejo al más nuevo (los primeros `limite`, si se indica)."""
+        filas = self.conexion.execute(
+            "SELECT report_id, datos FROM reportes_pendientes WHERE creado >= ? ORDER BY creado LIMIT ?",
+            (self._limite_vigencia(), -1 if limite is None else limite),
+        )
+        return [(report_id, json.loads(datos)) for report_id, datos in filas]
+
+    def obtener_varios(self, report_ids):
+        """Reportes vigentes entre `report_ids`, como {report_id: datos} en el orden pedido."""
+        encontrados = {}
+        for lote in _lotes(report_ids):
+            marcas = ", ".join("?" * len(lote))
+            filas = self.conexion.execute(
+                f"SELECT report_id, datos FROM reportes_pendientes WHERE report_id IN ({marcas}) AND creado >= ?",
+                (*lote, self._limite_vigencia()),
+            )
+            encontrados.update((report_id, json.loads(datos)) for report_id, datos in filas)
+        return {report_id: encontrados[report_id] for report_id in report_ids if report_id in encontrados}
+
+    def eliminar_varios(self, report_ids):
+        """Elimina varios reportes en una sola transacción. Devuelve cuántos se eliminaron."""
+        eliminados = 0
+        with self.conexion:
+            for lote in _lotes(report_ids):
+                marcas = ", ".join("?" * len(lote))
+                eliminados += self.conexion.execute(
+                    f"DELETE FROM reportes_pendientes WHERE report_id IN ({marcas})", lote
+                ).rowcount
+        self._cantidad -= eliminados
+        return eliminados
+
+    def purgar(self):
+        """Elimina los reportes vencidos y, si sobran, los más viejos. Devuelve cuántos se eliminaron."""
+        with self.conexion:
+            vencidos = self.conexion.execute(
+                "DELETE FROM reportes_pendientes WHERE creado < ?", (self._limite_vigencia(),)
+            ).rowcount
+            self._cantidad -= vencidos
+            sobrantes = 0
+            if self._cantidad > self.maximo:
+                sobrantes = self.conexion.execute(
+                    """
+                    DELETE FROM reportes_pendientes WHERE report_id IN (
+                        SELECT report_id FROM reportes_pendientes ORDER BY creado LIMIT ?
+                    )
+                    """,
+                    (self._cantidad - self.maximo,),
+                ).rowcount
+                self._cantidad -= sobrantes
+        if vencidos or sobrantes:
+            logger.info("Reportes pendientes descartados: %s vencidos, %s por exceso.", vencidos, sobrantes)
+        return vencidos + sobrantes
+
+    def cerrar(self):
+        self.conexion.close()
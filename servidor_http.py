@@ -0,0 +1,105 @@
+"""
+Servidor HTTP mínimo sobre asyncio, sin dependencias externas.
+
+Alcanza para recibir el webhook de Telegram y para exponer datos internos en un
+puerto local: entiende HTTP/1.1 con Content-Length y conexiones keep-alive, y
+delega cada solicitud en una corrutina `manejador(metodo, ruta, encabezados, cuerpo)`
+que devuelve (estado, tipo_de_contenido, cuerpo_en_bytes).
+"""
+import asyncio
+import logging
+from http import HTTPStatus
+
+logger = logging.getLogger(__name__)
+
+# Tamaño máximo del cuerpo de una solicitud (una actualización de Telegram ocupa unos pocos KB).
+MAX_CUERPO = 1024 * 1024
+
+
+class ServidorHTTP:
+    def __init__(self, manejador, host="127.0.0.1", puerto=8080, max_cuerpo=MAX_CUERPO):
+        self.manejador = manejador
+        self.host = host
+        self.puerto = puerto
+        self.max_cuerpo = max_cuerpo
+        self._servidor = None
+        # Tarea que atiende cada conexión abierta, para cerrarlas al detener el servidor.
+        self._conexiones = set()
+
+    async def iniciar(self):
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto)
+        # Con puerto=0 el sistema elige uno libre; se guarda el real.
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        logger.info("Servidor HTTP escuchando en %s:%s.", self.host, self.puerto)
+
+    async def detener(self):
+        if self._servidor is None:
+            return
+        self._servidor.close()
+        for tarea in list(self._conexiones):
+            tarea.cancel()
+        await asyncio.gather(*self._conexiones, return_exceptions=True)
+        await self._servidor.wait_closed()
+        self._servidor = None
+
+    async def _atender(self, lector, escritor):
+        tarea = asyncio.current_task()
+        self._conexiones.add(tarea)
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                try:
+                    metodo, ruta, version = linea.decode("latin-1").split()
+                except ValueError:
+                    await self._responder(escritor, 400, "text/plain", b"", mantener=False)
+                    break
+
+                encabezados = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b"\r\n", b"\n", b""):
+                        break
+                    nombre, _, valor = linea.decode("latin-1").partition(":")
+                    encabezados[nombre.strip().lower()] = valor.strip()
+
+                if "chunked" in encabezados.get("transfer-encoding", "").lower():
+                    await self._responder(escritor, 411, "text/plain", b"", mantener=False)
+                    break
+                try:
+                    largo = int(encabezados.get("content-length", 0))
+                except ValueError:
+                    largo = -1
+                if largo < 0 or largo > self.max_cuerpo:
+                    await self._responder(escritor, 413, "text/plain", b"", mantener=False)
+                    break
+                cuerpo = await lector.readexactly(largo) if largo else b""
+
+                ruta = ruta.partition("?")[0]
+                try:
+                    estado, tipo, respuesta = await self.manejador(metodo, ruta, encabezados, cuerpo)
+                except Exception:
+                    logger.exception("Error atendiendo %s %s", metodo, ruta)
+                    estado, tipo, respuesta = 500, "text/plain", b""
+
+                mantener = version == "HTTP/1.1" and encabezados.get("connection", "").lower() != "close"
+                await self._responder(escritor, estado, tipo, respuesta, mantener)
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._conexiones.discard(tarea)
+            escritor.close()
+
+    async def _responder(self, escritor, estado, tipo, cuerpo, mantener):
+        encabezados = (
+            f"HTTP/1.1 {estado} {HTTPStatus(estado).phrase}\r\n"
+            f"Content-Type: {tipo}\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n"
+            f"Connection: {'keep-alive' if mantener else 'close'}\r\n"
+            "\r\n"
+        )
+        escritor.write(encabezados.encode("latin-1") + cuerpo)
+        await escritor.drain()
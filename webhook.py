@@ -0,0 +1,117 @@
+"""
+Recepción de actualizaciones por webhook, como alternativa a run_polling.
+
+Telegram envía cada actualización con un POST a la URL configurada; el
+servidor HTTP embebido la valida (ruta y encabezado con el token secreto), la
+convierte en Update y la deja en la cola de la Application, que la procesa
+igual que si hubiera llegado por polling.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import signal
+
+from telegram import Update
+
+from servidor_http import ServidorHTTP
+
+logger = logging.getLogger(__name__)
+
+ENCABEZADO_SECRETO = "x-telegram-bot-api-secret-token"
+
+class ReceptorWebhook:
+    """
+    Manejador HTTP que pasa a la Application las actualizaciones recibidas en `ruta`.
+    Si se pasa `metricas`, exporta las aceptadas y rechazadas como contador.
+    """
+
+    def __init__(self, application, ruta="/", secreto=None, metricas=None):
+        self.application = application
+        self.ruta = ruta
+        self.secreto = secreto.encode() if secreto else None
+        self.recibidas = 0
+        self.rechazadas = 0
+        if metricas is not None:
+            metricas.medidor(
+                "bot_webhook_updates_total",
+                lambda: {
+                    (("resultado", "aceptada"),): self.recibidas,
+                    (("resultado", "rechazada"),): self.rechazadas,
+                },
+                "Actualizaciones recibidas por webhook, aceptadas o rechazadas.",
+                tipo="counter",
+            )
+
+    async def __call__(self, metodo, ruta, encabezados, cuerpo):
+        if ruta != self.ruta:
+            return 404, "text/plain", b""
+        if metodo != "POST":
+            return 405, "text/plain", b""
+        if self.secreto is not None:
+            recibido = encabezados.get(ENCABEZADO_SECRETO, "").encode("latin-1")
+            if not hmac.compare_digest(recibido, self.secreto):
+                self.rechazadas += 1
+                logger.warning("Solicitud al webhook con token secreto inválido.")
+                return 403, "text/plain", b""
+        try:
+            datos = json.loads(cuerpo)
+            if not isinstance(datos, dict):
+                raise TypeError("se esperaba un objeto JSON")
+            update = Update.de_json(datos, self.application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            self.rechazadas += 1
+            logger.warning("Actualización inválida recibida por webhook: %s", e)
+            return 400, "text/plain", b""
+
+        self.recibidas += 1
+        await self.application.update_queue.put(update)
+        return 200, "text/plain", b""
+
+
+async def servir_webhook(
+    application,
+    host="127.0.0.1",
+    puerto=8443,
+    ruta="/",
+    secreto=None,
+    url=None,
+    allowed_updates=None,
+    detener=None,
+    metricas=None,
+):
+    """
+    Inicia la Application y el servidor HTTP, registra el webhook en Telegram
+    (si se indica `url`) y atiende hasta recibir SIGINT/SIGTERM o hasta que se
+    active el evento `detener`. `metricas` se pasa a ReceptorWebhook. Ejecuta los hooks post_init/post_stop/post_shutdown
+    igual que run_polling.
+    """
+    if detener is None:
+        detener = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(senal, detener.set)
+            except NotImplementedError:
+                pass
+
+    servidor = ServidorHTTP(ReceptorWebhook(application, ruta, secreto, metricas), host, puerto)
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await application.start()
+        await servidor.iniciar()
+        if url:
+            await application.bot.set_webhook(url, secret_token=secreto, allowed_updates=allowed_updates)
+            logger.info("Webhook registrado en %s (actualizaciones: %s).", url, allowed_updates)
+        await detener.wait()
+    finally:
+        await servidor.detener()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)